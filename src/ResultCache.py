@@ -0,0 +1,139 @@
+import dataclasses
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from numpy import ndarray
+
+from .checkpoint import atomic_save
+from .inputs.save_file_types import SolveResultSavedDict
+from .modules.DualParameters import DualParameters
+from .preprocessing.solver_inputs import SolverInputs
+from .training.TrainingConfig import TrainingConfig
+from .utils import update_hasher
+
+SolveResult = Tuple[bool, Optional[List[ndarray]], Optional[List[ndarray]]]
+
+# Fields that only affect the speed/memory/logging of solving, and not its results.
+_CONFIG_FIELDS_NOT_AFFECTING_RESULTS = {
+    "num_workers",
+    "compile_solver",
+    "disable_progress_bar",
+    "keep_dual_parameters",
+}
+
+
+class ResultCache:
+    """Persistent on-disk cache of `solve()`'s results, keyed by a hash of the
+    model's weights, the other `SolverInputs` tensors, and the `TrainingConfig`
+    fields that affect the results (see `get_key`).
+
+    Each result is saved in its own file. When the total size of the cache
+    exceeds `max_size_bytes`, the least-recently-used results are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 1024**3) -> None:
+        """
+        Args:
+            cache_dir (str): Dir to store the cached results in. Created if it doesn't exist.
+            max_size_bytes (int, optional): Max. total size of the cached results. \
+                Defaults to 1 GiB.
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_key(
+        inputs: SolverInputs,
+        config: TrainingConfig,
+        initial_dual_parameters: Optional[Dict[int, DualParameters]] = None,
+    ) -> str:
+        """Returns the cache key of solving `inputs` with `config`, warm-started
+        from `initial_dual_parameters`. Also the basis of the layer checkpoints'
+        fingerprint (see `solve.get_checkpoint_fingerprint`), as they're results too.
+        """
+        config_dict = {
+            k: v
+            for k, v in dataclasses.asdict(config).items()
+            if k not in _CONFIG_FIELDS_NOT_AFFECTING_RESULTS
+        }
+        hasher = hashlib.sha256(inputs.get_fingerprint().encode())
+        hasher.update(json.dumps(config_dict, sort_keys=True, default=str).encode())
+        if initial_dual_parameters is not None:
+            for layer_index, dual_parameters in sorted(initial_dual_parameters.items()):
+                hasher.update(f"initial_dual_parameters[{layer_index}];".encode())
+                for tensor in [
+                    dual_parameters.neuron_indices,
+                    dual_parameters.gamma,
+                    *dual_parameters.pi_list,
+                    *dual_parameters.alpha_list,
+                ]:
+                    update_hasher(hasher, tensor)
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> Optional[SolveResult]:
+        """Returns the cached `(is_falsified, new_lower_bounds, new_upper_bounds)`
+        of `key`, or `None` if it isn't cached.
+        """
+        path = self._get_path(key)
+        try:
+            saved: SolveResultSavedDict = torch.load(path)
+            os.utime(path)  # Mark as recently used, for the LRU eviction.
+        except FileNotFoundError:  # Eg. evicted by another process.
+            return None
+
+        L_list, U_list = saved["L_list"], saved["U_list"]
+        return (
+            saved["is_falsified"],
+            [x.numpy() for x in L_list] if L_list is not None else None,
+            [x.numpy() for x in U_list] if U_list is not None else None,
+        )
+
+    def put(self, key: str, result: SolveResult) -> None:
+        """Caches `result` (ie. `(is_falsified, new_lower_bounds, new_upper_bounds)`)
+        under `key`, then evicts the least-recently-used results if needed.
+        """
+        is_falsified, L_list, U_list = result
+        saved: SolveResultSavedDict = {
+            "is_falsified": is_falsified,
+            "L_list": [torch.from_numpy(x) for x in L_list] if L_list is not None else None,
+            "U_list": [torch.from_numpy(x) for x in U_list] if U_list is not None else None,
+        }
+        atomic_save(saved, self._get_path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        """Evicts the least-recently-used results, until the cache's total size
+        is at most `max_size_bytes`."""
+        entries: List[Tuple[float, int, str]] = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".pt"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self) -> None:
+        """Removes all the cached results."""
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pt"):
+                os.remove(entry.path)
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
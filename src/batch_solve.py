@@ -0,0 +1,267 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, TextIO
+
+import torch
+from torch import nn
+
+from .checkpoint import atomic_save
+from .inputs.flat_file import is_flat_file
+from .inputs.save_file_types import SolveResultSavedDict, SolverInputsSavedDict
+from .preprocessing.solver_inputs import SolverInputs
+from .ResultCache import ResultCache
+from .solve import solve
+from .training.TrainingConfig import TrainingConfig
+from .utils import load_onnx_model, seed_everything, set_abs_path_to
+
+CURRENT_DIR = os.path.dirname(__file__)
+get_abs_path = set_abs_path_to(CURRENT_DIR)
+DEFAULT_CONFIG_FILE_PATH = get_abs_path("../default_training_config.yaml")
+
+# Per-worker-process state, set by `_init_worker`.
+_worker_models: Dict[str, nn.Module] = {}
+"""Loaded models of the worker, keyed by their ONNX file path, reused across jobs."""
+_worker_options: Optional["_WorkerOptions"] = None
+
+
+@dataclass
+class Job:
+    """A job of the manifest. Relative paths are relative to the manifest's dir."""
+
+    id: str
+    model: str
+    """Path to the ONNX model save file."""
+    inputs: str
+    """Path to the other inputs, saved via `SolverInputs.save_all_except_model` or \
+    `SolverInputs.save_flat_file_except_model`."""
+    config: Optional[str] = None
+    """Path to the `TrainingConfig` YAML file. Defaults to `default_training_config.yaml`."""
+
+
+@dataclass
+class JobResult:
+    """Result of a job, written as 1 JSON line."""
+
+    id: str
+    status: str
+    """`"verified"`, `"falsified"` or `"error"`."""
+    bounds_path: Optional[str] = None
+    """Path to the saved bounds (in `SolveResultSavedDict` format), if not errored."""
+    load_time: float = 0.0
+    """Time spent loading the model (`0` if reused) and inputs."""
+    solve_time: float = 0.0
+    wall_time: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class _WorkerOptions:
+    output_dir: str
+    device: str
+    seed: Optional[int]
+    cache_dir: Optional[str]
+
+
+def load_manifest(manifest_path: str) -> List[Job]:
+    """Loads the jobs of a JSONL manifest, whr each line is a JSON object with
+    the fields of `Job` (`id` defaults to the line number).
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs: List[Job] = []
+    with open(manifest_path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip() == "":
+                continue
+            job_dict = json.loads(line)
+            job_dict.setdefault("id", str(line_number))
+            job = Job(**job_dict)
+            assert _is_safe_filename(job.id), (
+                f"Expected the job ID on line {line_number} to be a valid file name "
+                f"(as it's used to name the bounds file), but got `{job.id}`."
+            )
+            job.model = os.path.join(manifest_dir, job.model)
+            job.inputs = os.path.join(manifest_dir, job.inputs)
+            if job.config is not None:
+                job.config = os.path.join(manifest_dir, job.config)
+            jobs.append(job)
+
+    ids = [x.id for x in jobs]
+    assert len(set(ids)) == len(ids), "Expected the job IDs to be unique."
+    return jobs
+
+
+def _is_safe_filename(name: str) -> bool:
+    """Whether `name` can be used as a file name in the output dir, without
+    escaping it (eg. via `/` or `..`)."""
+    separators = [x for x in [os.sep, os.altsep, "/", "\\"] if x is not None]
+    return (
+        isinstance(name, str)
+        and name not in ["", ".", ".."]
+        and not any(x in name for x in separators)
+        and "\0" not in name
+    )
+
+
+def run_jobs(
+    jobs: List[Job],
+    output_dir: str,
+    results_file: TextIO,
+    concurrency: int = 1,
+    device: str = "cpu",
+    num_threads: Optional[int] = None,
+    seed: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+) -> List[JobResult]:
+    """Runs the jobs in a pool of `concurrency` worker processes, writing each
+    job's result as 1 JSON line to `results_file` as soon as it finishes.
+
+    Jobs are submitted grouped by model, so that each worker tends to reuse
+    the models it has already loaded.
+
+    Args:
+        jobs (List[Job]): Jobs to run.
+        output_dir (str): Dir to save each job's bounds to, as `<id>.pt`.
+        results_file (TextIO): File to stream the results to (eg. `sys.stdout`).
+        concurrency (int, optional): Num. of jobs to run at once. Defaults to 1.
+        device (str, optional): Device to solve on. Defaults to "cpu".
+        num_threads (Optional[int], optional): Num. of threads per worker. Defaults to \
+            None (ie. the CPU count divided by `concurrency`).
+        seed (Optional[int], optional): Seed to seed each job with. Defaults to None.
+        cache_dir (Optional[str], optional): Dir of the `ResultCache` to use. Defaults \
+            to None (ie. no caching).
+    """
+    assert concurrency >= 1, "Expected `concurrency` to be >= 1."
+    for job in jobs:
+        assert _is_safe_filename(job.id), f"Expected the job ID to be a file name, got `{job.id}`."
+    os.makedirs(output_dir, exist_ok=True)
+    if num_threads is None:
+        num_threads = max(1, (os.cpu_count() or 1) // concurrency)
+    options = _WorkerOptions(output_dir, device, seed, cache_dir)
+
+    results: List[JobResult] = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=concurrency,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(options, num_threads),
+    ) as executor:
+        futures = {executor.submit(_run_job, x): x for x in sorted(jobs, key=lambda x: x.model)}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                # Eg. `BrokenProcessPool` if a worker was killed, which fails
+                # all of the pending jobs, so each is reported as errored.
+                result = JobResult(
+                    id=futures[future].id, status="error", error=traceback.format_exc()
+                )
+            results_file.write(json.dumps(asdict(result)) + "\n")
+            results_file.flush()
+            results.append(result)
+    return results
+
+
+def _init_worker(options: _WorkerOptions, num_threads: int) -> None:
+    global _worker_options
+    torch.set_num_threads(num_threads)
+    _worker_options = options
+
+
+def _run_job(job: Job) -> JobResult:
+    assert _worker_options is not None
+    options = _worker_options
+    start_time = time.perf_counter()
+    try:
+        model = _worker_models.get(job.model)
+        if model is None:
+            model = _worker_models[job.model] = load_onnx_model(job.model)
+        if is_flat_file(job.inputs):
+            solver_inputs = SolverInputs.load_flat_file(model, job.inputs)
+        else:
+            saved: SolverInputsSavedDict = torch.load(job.inputs)
+            solver_inputs = SolverInputs(model=model, **saved)
+        training_config = TrainingConfig.from_yaml_file(job.config or DEFAULT_CONFIG_FILE_PATH)
+        training_config.disable_progress_bar = True
+        load_time = time.perf_counter() - start_time
+
+        if options.seed is not None:
+            seed_everything(options.seed)
+        is_falsified, L_list, U_list = solve(
+            solver_inputs,
+            device=torch.device(options.device),
+            training_config=training_config,
+            cache=ResultCache(options.cache_dir) if options.cache_dir is not None else None,
+        )
+        solve_time = time.perf_counter() - start_time - load_time
+
+        bounds_path = os.path.join(options.output_dir, f"{job.id}.pt")
+        saved_result: SolveResultSavedDict = {
+            "is_falsified": is_falsified,
+            "L_list": [torch.from_numpy(x) for x in L_list] if L_list is not None else None,
+            "U_list": [torch.from_numpy(x) for x in U_list] if U_list is not None else None,
+        }
+        atomic_save(saved_result, bounds_path)
+    except Exception:
+        return JobResult(
+            id=job.id,
+            status="error",
+            wall_time=time.perf_counter() - start_time,
+            error=traceback.format_exc(),
+        )
+
+    return JobResult(
+        id=job.id,
+        status="falsified" if is_falsified else "verified",
+        bounds_path=bounds_path,
+        load_time=load_time,
+        solve_time=solve_time,
+        wall_time=time.perf_counter() - start_time,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Solve a manifest of jobs, streaming 1 JSON line per finished job."
+    )
+    parser.add_argument("manifest", help="JSONL file of jobs, each with `model`, `inputs`, etc.")
+    parser.add_argument("--output-dir", required=True, help="Dir to save the bounds to.")
+    parser.add_argument("--results", default=None, help="JSONL file to write. Default: stdout.")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--num-threads", type=int, default=None, help="Threads per worker.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None, help="Dir of the result cache to use.")
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    results_file = open(args.results, "a") if args.results is not None else sys.stdout
+    try:
+        results = run_jobs(
+            jobs,
+            args.output_dir,
+            results_file,
+            concurrency=args.concurrency,
+            device=args.device,
+            num_threads=args.num_threads,
+            seed=args.seed,
+            cache_dir=args.cache_dir,
+        )
+    finally:
+        if results_file is not sys.stdout:
+            results_file.close()
+
+    num_errors = sum(x.status == "error" for x in results)
+    print(f"{len(results) - num_errors}/{len(results)} jobs finished w/o errors.", file=sys.stderr)
+    return 1 if num_errors > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
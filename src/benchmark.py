@@ -0,0 +1,441 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+from torch import Tensor
+
+from .inputs.synthetic import generate_synthetic_inputs
+from .preprocessing.solver_inputs import SolverInputs
+from .solve import solve
+from .training.TrainingCallback import TrainingCallback
+from .training.TrainingConfig import TrainingConfig
+from .utils import seed_everything, set_abs_path_to
+
+CURRENT_DIR = os.path.dirname(__file__)
+get_abs_path = set_abs_path_to(CURRENT_DIR)
+DEFAULT_CONFIG_FILE_PATH = get_abs_path("../default_training_config.yaml")
+
+DEFAULT_CASES: List[str] = ["toy", "mnist_256x6", "conv_med", "synthetic"]
+
+HIGHER_IS_BETTER_METRICS: List[str] = ["epochs_per_second"]
+LOWER_IS_BETTER_METRICS: List[str] = ["wall_time", "peak_rss_mb"]
+TIGHTNESS_METRICS: List[str] = ["mean_relative_width"]
+
+LAZY_MODULES: List[str] = ["onnx", "onnx2torch", "matplotlib", "tqdm", "pytest"]
+"""Heavy modules that `from src.solve import solve` mustn't import, as they're
+only imported on first use."""
+_IMPORT_TIME_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import torch
+torch_time = time.perf_counter() - start
+from src.solve import solve
+total_time = time.perf_counter() - start
+print(json.dumps({"torch": torch_time, "total": total_time, "modules": list(sys.modules)}))
+"""
+
+
+@dataclass
+class SyntheticSpec:
+    """Size of the synthetic network to benchmark. See `generate_synthetic_inputs`."""
+
+    width: int = 64
+    depth: int = 3
+    input_size: int = 16
+    conv_channels: List[int] = field(default_factory=list)
+    unstable_ratio: float = 0.3
+    num_constraints: int = 1
+    seed: int = 0
+
+
+@dataclass
+class CaseResult:
+    """Benchmark results of 1 `solve` run."""
+
+    is_falsified: bool
+    num_epochs: int
+    epochs_per_second: float
+    layer_times: List[float]
+    wall_time: float
+    peak_rss_mb: float
+    adv_check_time: float = 0.0
+    solver_layer_forward_times: Optional[List[float]] = None
+    """Total forward time of each solver layer, if `time_solver_layers=True`."""
+    solver_layer_backward_times: Optional[List[float]] = None
+    """Total backward time of each solver layer, if `time_solver_layers=True`."""
+    mean_width: Optional[float] = None
+    """Mean width (ie. `U - L`) of the solved neurons' new bounds."""
+    mean_relative_width: Optional[float] = None
+    """Mean of the solved neurons' new-width-over-initial-width ratios. Lower is tighter."""
+    skipped_reason: Optional[str] = None
+
+
+class _BenchmarkCallback(TrainingCallback):
+    """Accumulates the training events needed for the benchmark results."""
+
+    def __init__(self, time_solver_layers: bool = False) -> None:
+        self.time_solver_layers = time_solver_layers
+        self.num_epochs = 0
+        self.layer_times: List[float] = []
+        self.adv_check_time = 0.0
+        self.solver_layer_forward_times: List[float] = []
+        self.solver_layer_backward_times: List[float] = []
+
+    def on_layer_end(self, layer_index: int, duration: float, is_falsified: bool) -> None:
+        self.layer_times.append(duration)
+
+    def on_epoch(self, epoch: int, loss: float, lrs: Dict[str, float]) -> None:
+        self.num_epochs += 1
+
+    def on_adv_check(self, epoch: int, duration: float, is_falsified: bool) -> None:
+        self.adv_check_time += duration
+
+    def on_solver_layer_times(
+        self,
+        epoch: int,
+        forward_times: List[float],
+        backward_times: List[float],
+    ) -> None:
+        if len(self.solver_layer_forward_times) != len(forward_times):
+            self.solver_layer_forward_times = [0.0] * len(forward_times)
+            self.solver_layer_backward_times = [0.0] * len(backward_times)
+        for i, (forward_time, backward_time) in enumerate(zip(forward_times, backward_times)):
+            self.solver_layer_forward_times[i] += forward_time
+            self.solver_layer_backward_times[i] += backward_time
+
+
+def _load_toy() -> SolverInputs:
+    from .inputs.toy_example import solver_inputs
+
+    return solver_inputs
+
+
+def _load_mnist_256x6() -> SolverInputs:
+    from .inputs.mnist_256x6 import solver_inputs
+
+    return solver_inputs
+
+
+def _load_conv_med() -> SolverInputs:
+    from .inputs.conv_med import solver_inputs
+
+    return solver_inputs
+
+
+def _load_case(case_name: str, synthetic_spec: SyntheticSpec) -> SolverInputs:
+    loaders: Dict[str, Callable[[], SolverInputs]] = {
+        "toy": _load_toy,
+        "mnist_256x6": _load_mnist_256x6,
+        "conv_med": _load_conv_med,
+        "synthetic": lambda: generate_synthetic_inputs(**asdict(synthetic_spec)),
+    }
+    assert case_name in loaders, f"Unknown case '{case_name}', expected one of {list(loaders)}."
+    return loaders[case_name]()
+
+
+def run_case(
+    case_name: str,
+    training_config: TrainingConfig,
+    synthetic_spec: SyntheticSpec = SyntheticSpec(),
+    num_threads: Optional[int] = None,
+    time_solver_layers: bool = False,
+) -> CaseResult:
+    """Solves 1 benchmark case on CPU, and measures its performance.
+
+    The peak RSS is that of the whole process, so each case should be run in
+    its own process (as done by `run_benchmarks`).
+
+    Args:
+        case_name (str): Name of the case to solve. One of `DEFAULT_CASES`.
+        training_config (TrainingConfig): Configuration to use during training.
+        synthetic_spec (SyntheticSpec, optional): Size of the synthetic network, \
+            for the `"synthetic"` case. Defaults to SyntheticSpec().
+        num_threads (Optional[int], optional): Num. of threads for torch to use. \
+            Defaults to None (ie. torch's default).
+        time_solver_layers (bool, optional): Whether to also time each solver layer's \
+            forward/backward pass, which slightly slows down training. Defaults to False.
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    seed_everything(0)
+
+    try:
+        inputs = _load_case(case_name, synthetic_spec)
+    except (FileNotFoundError, ImportError) as e:
+        return CaseResult(False, 0, 0.0, [], 0.0, 0.0, skipped_reason=f"{type(e).__name__}: {e}")
+
+    callback = _BenchmarkCallback(time_solver_layers)
+    start_time = time.perf_counter()
+    is_falsified, new_L_list, new_U_list = solve(
+        inputs,
+        device=torch.device("cpu"),
+        training_config=training_config,
+        callback=callback,
+    )
+    wall_time = time.perf_counter() - start_time
+
+    # `ru_maxrss` is in kilobytes on Linux, but in bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / 1024**2 if sys.platform == "darwin" else peak_rss / 1024
+
+    result = CaseResult(
+        is_falsified=is_falsified,
+        num_epochs=callback.num_epochs,
+        epochs_per_second=callback.num_epochs / wall_time,
+        layer_times=callback.layer_times,
+        wall_time=wall_time,
+        peak_rss_mb=peak_rss_mb,
+        adv_check_time=callback.adv_check_time,
+    )
+    if time_solver_layers:
+        result.solver_layer_forward_times = callback.solver_layer_forward_times
+        result.solver_layer_backward_times = callback.solver_layer_backward_times
+    if new_L_list is not None and new_U_list is not None:
+        # Exclude the output layer, which isn't solved for.
+        result.mean_width, result.mean_relative_width = _get_tightness(
+            inputs,
+            [torch.from_numpy(x) for x in new_L_list[:-1]],
+            [torch.from_numpy(x) for x in new_U_list[:-1]],
+        )
+    return result
+
+
+def _get_tightness(
+    inputs: SolverInputs,
+    new_L_list: List[Tensor],
+    new_U_list: List[Tensor],
+) -> Tuple[float, float]:
+    """Mean width & mean relative width of the solved neurons' new bounds,
+    whr the solved neurons are the input neurons and the unstable neurons.
+    """
+    widths: List[Tensor] = []
+    relative_widths: List[Tensor] = []
+    for i, (new_L, new_U) in enumerate(zip(new_L_list, new_U_list)):
+        L, U = inputs.L_list[i], inputs.U_list[i]
+        mask = (U - L > 0) if i == 0 else (L < 0) & (U > 0)
+        width = (new_U - new_L)[mask]
+        widths.append(width)
+        relative_widths.append(width / (U - L)[mask])
+    all_widths = torch.cat(widths)
+    if all_widths.numel() == 0:
+        return 0.0, 1.0
+    return all_widths.mean().item(), torch.cat(relative_widths).mean().item()
+
+
+def run_benchmarks(
+    case_names: List[str],
+    training_config: TrainingConfig,
+    synthetic_spec: SyntheticSpec = SyntheticSpec(),
+    num_threads: Optional[int] = None,
+    time_solver_layers: bool = False,
+) -> Dict:
+    """Runs each case in a fresh process (so that their peak RSS are measured
+    independently), and returns the results in a JSON-serializable dict.
+    """
+    results: Dict[str, Dict] = {}
+    context = multiprocessing.get_context("spawn")
+    for case_name in case_names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            future = executor.submit(
+                run_case,
+                case_name,
+                training_config,
+                synthetic_spec,
+                num_threads,
+                time_solver_layers,
+            )
+            result = future.result()
+        results[case_name] = asdict(result)
+        status = (
+            f"skipped ({result.skipped_reason})"
+            if result.skipped_reason is not None
+            else f"{result.wall_time:.2f}s, {result.epochs_per_second:.1f} epochs/s"
+        )
+        print(f"{case_name}: {status}", file=sys.stderr)
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python_version": platform.python_version(),
+            "torch_version": torch.__version__,
+            "platform": platform.platform(),
+            "num_threads": num_threads if num_threads is not None else torch.get_num_threads(),
+            "synthetic_spec": asdict(synthetic_spec),
+            "training_config": asdict(training_config),
+        },
+        "results": results,
+    }
+
+
+def benchmark_import_time(num_runs: int = 5) -> Dict:
+    """Measures the time taken by `from src.solve import solve` in `num_runs`
+    fresh interpreters (taking the fastest run), and which of the `LAZY_MODULES`
+    it imported. The time taken by `import torch` is measured separately, as
+    it's the bulk of it.
+    """
+    runs: List[Dict] = []
+    for _ in range(num_runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", _IMPORT_TIME_CODE],
+            cwd=os.path.dirname(CURRENT_DIR),  # The repo's root.
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(completed.stdout))
+
+    fastest = min(runs, key=lambda x: x["total"])
+    imported_modules = set(fastest["modules"])
+    return {
+        "import_torch_time": fastest["torch"],
+        "import_solve_time": fastest["total"],
+        "import_overhead_time": fastest["total"] - fastest["torch"],
+        "lazy_modules_imported": [x for x in LAZY_MODULES if x in imported_modules],
+    }
+
+
+def compare_benchmarks(
+    baseline: Dict,
+    current: Dict,
+    threshold: float = 0.1,
+    tightness_threshold: float = 0.01,
+) -> List[str]:
+    """Compares benchmark results against a baseline, and returns a message for
+    each metric that regressed by more than the relative thresholds.
+
+    Args:
+        baseline (Dict): Baseline results, as returned by `run_benchmarks`.
+        current (Dict): Results to compare, as returned by `run_benchmarks`.
+        threshold (float, optional): Max. allowed relative regression of the \
+            speed & memory metrics. Defaults to 0.1.
+        tightness_threshold (float, optional): Max. allowed relative regression \
+            of the bound-tightness metrics. Defaults to 0.01.
+    """
+    regressions: List[str] = []
+    for case_name, current_result in current["results"].items():
+        baseline_result = baseline["results"].get(case_name)
+        if baseline_result is None:
+            continue
+        if baseline_result["skipped_reason"] or current_result["skipped_reason"]:
+            continue
+
+        def check(metric: str, max_ratio: float, higher_is_better: bool) -> None:
+            old, new = baseline_result[metric], current_result[metric]
+            if old is None or new is None or old == 0:
+                return
+            ratio = old / new if higher_is_better else new / old
+            if ratio > 1 + max_ratio:
+                regressions.append(f"{case_name}.{metric}: {old:.6g} -> {new:.6g}")
+
+        for metric in HIGHER_IS_BETTER_METRICS:
+            check(metric, threshold, higher_is_better=True)
+        for metric in LOWER_IS_BETTER_METRICS:
+            check(metric, threshold, higher_is_better=False)
+        for metric in TIGHTNESS_METRICS:
+            check(metric, tightness_threshold, higher_is_better=False)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="CPU benchmarks for `solve`.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("--cases", nargs="+", default=DEFAULT_CASES, choices=DEFAULT_CASES)
+    run_parser.add_argument("--config", default=DEFAULT_CONFIG_FILE_PATH)
+    run_parser.add_argument("--output", default=None, help="JSON file to write. Default: stdout.")
+    run_parser.add_argument("--num-threads", type=int, default=None)
+    run_parser.add_argument(
+        "--time-solver-layers",
+        action="store_true",
+        help="Also time each solver layer's forward/backward pass.",
+    )
+    run_parser.add_argument("--width", type=int, default=SyntheticSpec.width)
+    run_parser.add_argument("--depth", type=int, default=SyntheticSpec.depth)
+    run_parser.add_argument("--input-size", type=int, default=SyntheticSpec.input_size)
+    run_parser.add_argument("--conv-channels", type=int, nargs="*", default=[])
+    run_parser.add_argument("--unstable-ratio", type=float, default=SyntheticSpec.unstable_ratio)
+    run_parser.add_argument("--num-constraints", type=int, default=SyntheticSpec.num_constraints)
+
+    import_time_parser = subparsers.add_parser(
+        "import-time", help="Measure the import time of `src.solve`."
+    )
+    import_time_parser.add_argument("--num-runs", type=int, default=5)
+    import_time_parser.add_argument(
+        "--max-overhead",
+        type=float,
+        default=None,
+        help="Max. import time (in seconds) on top of `import torch`, exceeding which fails.",
+    )
+
+    compare_parser = subparsers.add_parser("compare", help="Flag regressions against a baseline.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    compare_parser.add_argument("--tightness-threshold", type=float, default=0.01)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        training_config = TrainingConfig.from_yaml_file(args.config)
+        training_config.disable_progress_bar = True
+        synthetic_spec = SyntheticSpec(
+            width=args.width,
+            depth=args.depth,
+            input_size=args.input_size,
+            conv_channels=args.conv_channels,
+            unstable_ratio=args.unstable_ratio,
+            num_constraints=args.num_constraints,
+        )
+        output = run_benchmarks(
+            args.cases,
+            training_config,
+            synthetic_spec,
+            args.num_threads,
+            args.time_solver_layers,
+        )
+        output_str = json.dumps(output, indent=2)
+        if args.output is None:
+            print(output_str)
+        else:
+            with open(args.output, "w") as f:
+                f.write(output_str)
+        return 0
+
+    if args.command == "import-time":
+        output = benchmark_import_time(args.num_runs)
+        print(json.dumps(output, indent=2))
+        is_failed = False
+        if len(output["lazy_modules_imported"]) > 0:
+            print(f"REGRESSION eagerly imported: {output['lazy_modules_imported']}")
+            is_failed = True
+        if args.max_overhead is not None and output["import_overhead_time"] > args.max_overhead:
+            print(f"REGRESSION import overhead: {output['import_overhead_time']:.3f}s")
+            is_failed = True
+        return 1 if is_failed else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare_benchmarks(baseline, current, args.threshold, args.tightness_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if len(regressions) == 0:
+        print("No regressions.")
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
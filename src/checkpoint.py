@@ -0,0 +1,112 @@
+import os
+import tempfile
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+import torch
+from torch import Tensor
+
+from .inputs.save_file_types import DualParametersSavedDict, LayerCheckpointSavedDict
+from .modules.DualParameters import DualParameters
+
+
+def save_layer_checkpoint(
+    checkpoint_dir: str,
+    fingerprint: str,
+    layer_index: int,
+    new_bounds: Optional[Tuple[Tensor, Tensor]],
+    dual_parameters: Optional[DualParameters] = None,
+) -> None:
+    """Atomically saves the results of solving for layer `layer_index` to
+    `checkpoint_dir`, such that a killed process never leaves a partially
+    written checkpoint behind.
+
+    Args:
+        checkpoint_dir (str): Dir to save the checkpoint to. Created if it doesn't exist.
+        fingerprint (str): Fingerprint of the problem being solved for (ie. its \
+            inputs, result-affecting configs, initial dual parameters and \
+            `keep_dual_parameters`, see `solve.get_checkpoint_fingerprint`).
+        layer_index (int): Index of the layer that was solved for.
+        new_bounds (Optional[Tuple[Tensor, Tensor]]): The layer's tightened \
+            `(new_lower_bounds, new_upper_bounds)`, or `None` if the problem was falsified.
+        dual_parameters (Optional[DualParameters], optional): The layer's dual \
+            parameters to also save. Defaults to None.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    saved_dict: LayerCheckpointSavedDict = {
+        "fingerprint": fingerprint,
+        "layer_index": layer_index,
+        "is_falsified": new_bounds is None,
+        "L": new_bounds[0].cpu() if new_bounds is not None else None,
+        "U": new_bounds[1].cpu() if new_bounds is not None else None,
+        "dual_parameters": (
+            _dual_parameters_to_dict(dual_parameters) if dual_parameters is not None else None
+        ),
+    }
+
+    atomic_save(saved_dict, _get_checkpoint_path(checkpoint_dir, layer_index))
+
+
+def atomic_save(obj: object, path: str) -> None:
+    """Saves `obj` via `torch.save` to `path` atomically (see `atomic_write`)."""
+    atomic_write(lambda file: torch.save(obj, file), path)
+
+
+def atomic_write(write: Callable[[BinaryIO], None], path: str) -> None:
+    """Writes to `path` atomically, by calling `write` on a temp file in the
+    same dir, then replacing `path` with it.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w+b") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_layer_checkpoints(
+    checkpoint_dir: str, fingerprint: str
+) -> Dict[int, LayerCheckpointSavedDict]:
+    """Loads the consecutive layer checkpoints (starting from layer 0) in
+    `checkpoint_dir` that were saved for the inputs with `fingerprint`.
+
+    Checkpoints of other inputs, or that come after a missing layer, are ignored.
+    """
+    checkpoints: Dict[int, LayerCheckpointSavedDict] = {}
+    layer_index = 0
+    while True:
+        path = _get_checkpoint_path(checkpoint_dir, layer_index)
+        if not os.path.isfile(path):
+            break
+        checkpoint: LayerCheckpointSavedDict = torch.load(path)
+        if checkpoint["fingerprint"] != fingerprint:
+            break
+        checkpoints[layer_index] = checkpoint
+        if checkpoint["is_falsified"]:
+            break
+        layer_index += 1
+    return checkpoints
+
+
+def get_checkpoint_dual_parameters(
+    checkpoint: LayerCheckpointSavedDict,
+) -> Optional[DualParameters]:
+    """Returns the dual parameters saved in `checkpoint`, if any."""
+    saved = checkpoint["dual_parameters"]
+    return DualParameters(**saved) if saved is not None else None
+
+
+def _get_checkpoint_path(checkpoint_dir: str, layer_index: int) -> str:
+    return os.path.join(checkpoint_dir, f"layer_{layer_index}.pt")
+
+
+def _dual_parameters_to_dict(dual_parameters: DualParameters) -> DualParametersSavedDict:
+    return {
+        "neuron_indices": dual_parameters.neuron_indices,
+        "gamma": dual_parameters.gamma,
+        "pi_list": dual_parameters.pi_list,
+        "alpha_list": dual_parameters.alpha_list,
+    }
@@ -1,6 +1,5 @@
 from typing import List, Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
 import torch
 from torch import Tensor
@@ -131,6 +130,9 @@ def plot_box_and_whiskers(
     """
     concat_values: List[np.ndarray] = [torch.cat(x).numpy() for x in values]
 
+    # Imported here, as it's slow to import and only needed for plotting.
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.boxplot(concat_values, vert=False, labels=labels)  # type: ignore
 
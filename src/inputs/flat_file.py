@@ -0,0 +1,92 @@
+import json
+import struct
+from typing import Any, BinaryIO, Dict, Tuple
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from ..checkpoint import atomic_write
+
+MAGIC = b"MLBSINPT"
+"""Magic bytes at the start of every flat file."""
+VERSION = 1
+"""Version of the flat file format. Bumped on any incompatible change."""
+ALIGNMENT = 64
+"""Alignment (in bytes) of the header's end and of each tensor's data."""
+
+# Layout: MAGIC | VERSION (uint32) | header size (uint64) | JSON header | padding | data
+_PREFIX = struct.Struct("<8sIQ")
+
+
+def write_flat_file(path: str, tensors: Dict[str, Tensor], metadata: Dict[str, Any]) -> None:
+    """Atomically writes `tensors` (and the JSON-serialisable `metadata`) to a
+    flat, versioned file at `path`, that can be memory-mapped via `read_flat_file`.
+
+    Each tensor's raw data is stored contiguously, aligned to `ALIGNMENT` bytes,
+    with its name/dtype/shape/offset in the JSON header.
+    """
+    arrays = {name: x.detach().cpu().contiguous().numpy() for name, x in tensors.items()}
+
+    # The offsets are relative to the start of the data section.
+    entries: Dict[str, Dict[str, Any]] = {}
+    data_size = 0
+    for name, array in arrays.items():
+        entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": data_size}
+        data_size = _align(data_size + array.nbytes)
+
+    header = json.dumps({"tensors": entries, "metadata": metadata}).encode()
+    data_start = _align(_PREFIX.size + len(header))
+
+    def write(file: BinaryIO) -> None:
+        file.write(_PREFIX.pack(MAGIC, VERSION, len(header)))
+        file.write(header)
+        file.write(b"\0" * (data_start - _PREFIX.size - len(header)))
+        for name, array in arrays.items():
+            file.seek(data_start + entries[name]["offset"])
+            file.write(array.tobytes())
+        file.truncate(data_start + data_size)
+
+    atomic_write(write, path)
+
+
+def read_flat_file(path: str) -> Tuple[Dict[str, Tensor], Dict[str, Any]]:
+    """Memory-maps the flat file at `path` (written via `write_flat_file`), and
+    returns its `(tensors, metadata)`.
+
+    The tensors are backed by the file's pages (copy-on-write), so loading is
+    near-instant, and processes that map the same file share 1 physical copy
+    of it, until they write to the tensors.
+    """
+    with open(path, "rb") as file:
+        magic, version, header_size = _PREFIX.unpack(file.read(_PREFIX.size))
+        assert magic == MAGIC, f"Expected `{path}` to be a flat inputs file."
+        assert (
+            version == VERSION
+        ), f"Expected flat file version {VERSION}, but `{path}` is version {version}."
+        header = json.loads(file.read(header_size))
+
+    data_start = _align(_PREFIX.size + header_size)
+    buffer = np.memmap(path, dtype=np.uint8, mode="c")
+    tensors: Dict[str, Tensor] = {}
+    for name, entry in header["tensors"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        num_elements = int(np.prod(shape, dtype=np.int64))
+        start = data_start + entry["offset"]
+        if num_elements == 0:
+            tensors[name] = torch.from_numpy(np.empty(shape, dtype=dtype))
+            continue
+        array = buffer[start : start + num_elements * dtype.itemsize].view(dtype).reshape(shape)
+        tensors[name] = torch.from_numpy(array)
+    return tensors, header["metadata"]
+
+
+def is_flat_file(path: str) -> bool:
+    """Returns whether the file at `path` is a flat file (ie. starts with `MAGIC`)."""
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _align(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
@@ -1,4 +1,4 @@
-from typing import List, TypedDict
+from typing import List, Optional, TypedDict
 
 from torch import Tensor
 from typing_extensions import NotRequired
@@ -20,3 +20,25 @@ class SolverInputsSavedDict(TypedDict):
     p_list: List[Tensor]
     ground_truth_neuron_index: int
     is_hwc: NotRequired[bool]
+
+
+class DualParametersSavedDict(TypedDict):
+    neuron_indices: Tensor
+    gamma: Tensor
+    pi_list: List[Tensor]
+    alpha_list: List[Tensor]
+
+
+class LayerCheckpointSavedDict(TypedDict):
+    fingerprint: str
+    layer_index: int
+    is_falsified: bool
+    L: Optional[Tensor]
+    U: Optional[Tensor]
+    dual_parameters: Optional[DualParametersSavedDict]
+
+
+class SolveResultSavedDict(TypedDict):
+    is_falsified: bool
+    L_list: Optional[List[Tensor]]
+    U_list: Optional[List[Tensor]]
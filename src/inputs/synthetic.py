@@ -0,0 +1,254 @@
+from typing import List, Sequence, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import Tensor, nn
+
+from ..preprocessing.solver_inputs import SolverInputs
+
+
+def generate_synthetic_inputs(
+    width: int = 64,
+    depth: int = 3,
+    conv_channels: Sequence[int] = (),
+    input_channels: int = 1,
+    input_size: int = 16,
+    num_classes: int = 10,
+    unstable_ratio: float = 0.3,
+    epsilon: float = 0.05,
+    num_constraints: int = 1,
+    seed: int = 0,
+) -> SolverInputs:
+    """Generates a random verification problem, for benchmarking/profiling the
+    solver on problems of arbitrary size without needing any data files.
+
+    The model is a random `nn.Sequential` of `len(conv_channels)` CNN layers
+    (kernel 4, stride 2, padding 1, each halving the height/width), followed by
+    `depth` hidden linear layers of `width` neurons, and a linear output layer.
+
+    The bounds are computed via interval propagation over an `epsilon`-box
+    around a random input. Each hidden layer's biases are shifted such that
+    roughly `unstable_ratio` of its neurons are unstable.
+
+    `H`/`d` constrain the output to the adversarial region `y_g - y_t <= 0`,
+    whr `y_g` is the predicted class of the box's center, and `y_t` is the
+    runner-up. `P`/`P_hat`/`p` are random nonnegative combinations of the
+    unstable neurons' triangle-relaxation constraints, so they're always valid.
+
+    Args:
+        width (int, optional): Num. of neurons of each hidden linear layer. Defaults to 64.
+        depth (int, optional): Num. of hidden linear layers. Defaults to 3.
+        conv_channels (Sequence[int], optional): Out channels of each CNN layer. \
+            Defaults to () (ie. an MLP).
+        input_channels (int, optional): Num. of input channels. Only used if there \
+            are CNN layers. Defaults to 1.
+        input_size (int, optional): Num. of input features for MLPs, or the input's \
+            height (and width) for CNNs. Defaults to 16.
+        num_classes (int, optional): Num. of output neurons. Defaults to 10.
+        unstable_ratio (float, optional): Target ratio of unstable neurons in each \
+            hidden layer. Defaults to 0.3.
+        epsilon (float, optional): Radius of the input box. Defaults to 0.05.
+        num_constraints (int, optional): Num. of `P`/`P_hat`/`p` constraints \
+            per hidden layer. Defaults to 1.
+        seed (int, optional): Seed for the random model & input. Defaults to 0.
+
+    Returns:
+        SolverInputs: The generated inputs, in CHW format.
+    """
+    assert 0 <= unstable_ratio <= 1, "Expected `unstable_ratio` to be in [0, 1]."
+    assert input_size % (2 ** len(conv_channels)) == 0, (
+        f"Expected `input_size` to be divisible by 2^{len(conv_channels)}, "
+        + "as each CNN layer halves the height/width."
+    )
+    generator = torch.Generator().manual_seed(seed)
+    torch.manual_seed(seed)
+
+    model = _build_model(width, depth, conv_channels, input_channels, input_size, num_classes)
+    input_shape: Tuple[int, ...] = (
+        (input_channels, input_size, input_size) if len(conv_channels) > 0 else (input_size,)
+    )
+    center = torch.rand(input_shape, generator=generator)
+    L_list, U_list = _propagate_and_set_biases(
+        model, center - epsilon, center + epsilon, unstable_ratio, generator
+    )
+
+    with torch.no_grad():
+        pred = model.forward(center.unsqueeze(0)).squeeze(0)
+    ground_truth, runner_up = pred.topk(2).indices.tolist()
+    H = torch.zeros((1, num_classes))
+    H[0, ground_truth] = 1
+    H[0, runner_up] = -1
+
+    P_list: List[Tensor] = []
+    P_hat_list: List[Tensor] = []
+    p_list: List[Tensor] = []
+    for L, U in zip(L_list[1:-1], U_list[1:-1]):
+        P, P_hat, p = _generate_constraints(L, U, num_constraints, generator)
+        P_list.append(P)
+        P_hat_list.append(P_hat)
+        p_list.append(p)
+
+    return SolverInputs(
+        model=model,
+        ground_truth_neuron_index=ground_truth,
+        L_list=L_list,
+        U_list=U_list,
+        H=H,
+        d=torch.zeros((1,)),
+        P_list=P_list,
+        P_hat_list=P_hat_list,
+        p_list=p_list,
+        is_hwc=False,
+    )
+
+
+def _build_model(
+    width: int,
+    depth: int,
+    conv_channels: Sequence[int],
+    input_channels: int,
+    input_size: int,
+    num_classes: int,
+) -> nn.Sequential:
+    modules: List[nn.Module] = []
+    in_channels = input_channels
+    for out_channels in conv_channels:
+        modules += [nn.Conv2d(in_channels, out_channels, 4, stride=2, padding=1), nn.ReLU()]
+        in_channels = out_channels
+
+    in_features = input_size
+    if len(conv_channels) > 0:
+        modules.append(nn.Flatten())
+        H_W = input_size // (2 ** len(conv_channels))
+        in_features = in_channels * H_W * H_W
+
+    for _ in range(depth):
+        modules += [nn.Linear(in_features, width), nn.ReLU()]
+        in_features = width
+    modules.append(nn.Linear(in_features, num_classes))
+    return nn.Sequential(*modules)
+
+
+@torch.no_grad()
+def _propagate_and_set_biases(
+    model: nn.Sequential,
+    L: Tensor,
+    U: Tensor,
+    unstable_ratio: float,
+    generator: torch.Generator,
+) -> Tuple[List[Tensor], List[Tensor]]:
+    """Interval-propagates the input bounds `L`/`U` through `model`, shifting
+    the biases of the layers followed by a ReLU to get roughly `unstable_ratio`
+    of unstable neurons.
+
+    Returns:
+        Tuple[List[Tensor], List[Tensor]]: The flattened pre-activation bounds \
+            `(L_list, U_list)`, including the input layer's.
+    """
+    L_list: List[Tensor] = [L.flatten()]
+    U_list: List[Tensor] = [U.flatten()]
+    modules = list(model.children())
+    for i, module in enumerate(modules):
+        if isinstance(module, nn.ReLU):
+            L, U = L.clamp(min=0), U.clamp(min=0)
+            continue
+        if isinstance(module, nn.Flatten):
+            L, U = L.flatten(), U.flatten()
+            continue
+        assert isinstance(module, (nn.Linear, nn.Conv2d))
+
+        mid, radius = (U + L) / 2, (U - L) / 2
+        if isinstance(module, nn.Linear):
+            mid = F.linear(mid, module.weight, module.bias)
+            radius = F.linear(radius, module.weight.abs())
+        else:
+            conv_kwargs = {"stride": module.stride, "padding": module.padding}
+            mid = F.conv2d(mid.unsqueeze(0), module.weight, module.bias, **conv_kwargs).squeeze(0)
+            radius = F.conv2d(radius.unsqueeze(0), module.weight.abs(), **conv_kwargs).squeeze(0)
+
+        is_followed_by_relu = i + 1 < len(modules) and isinstance(modules[i + 1], nn.ReLU)
+        if is_followed_by_relu:
+            assert module.bias is not None
+            shift = _get_bias_shift(mid, radius, unstable_ratio, generator)
+            module.bias += shift
+            mid = mid + (shift if isinstance(module, nn.Linear) else shift.view(-1, 1, 1))
+
+        L, U = mid - radius, mid + radius
+        L_list.append(L.flatten())
+        U_list.append(U.flatten())
+    return L_list, U_list
+
+
+def _get_bias_shift(
+    mid: Tensor,
+    radius: Tensor,
+    unstable_ratio: float,
+    generator: torch.Generator,
+) -> Tensor:
+    """Gets the bias shift such that roughly `unstable_ratio` of the neurons
+    with pre-activation bounds `mid +- radius` are unstable.
+
+    For linear layers (ie. 1D `mid`), each neuron is shifted individually. For
+    CNN layers (ie. `(C, H, W)`-shaped `mid`), the bias is per channel, so each
+    channel's shift is grid-searched to get its unstable ratio closest to the target.
+    """
+    if mid.dim() == 1:
+        num_neurons = mid.size(0)
+        rand = torch.rand(num_neurons, generator=generator)
+        is_unstable = torch.randperm(num_neurons, generator=generator) < round(
+            unstable_ratio * num_neurons
+        )
+        # Unstable neurons are moved to within `radius` of 0, and the stable
+        # ones to beyond it (randomly activated or deactivated).
+        sign = torch.where(torch.rand(num_neurons, generator=generator) < 0.5, -1.0, 1.0)
+        target_mid = torch.where(
+            is_unstable,
+            (2 * rand - 1) * 0.9 * radius,
+            sign * (1 + rand) * radius.clamp(min=1e-3),
+        )
+        return target_mid - mid
+
+    # Candidate shifts, relative to each channel's max. `|mid| + radius`.
+    num_channels = mid.size(0)
+    mid, radius = mid.reshape(num_channels, -1, 1), radius.reshape(num_channels, -1, 1)
+    scale = (mid.abs() + radius).amax(dim=(1, 2), keepdim=True)
+    shifts = torch.linspace(-1, 1, 201).view(1, 1, -1) * scale
+    ratios = ((mid + shifts).abs() < radius).float().mean(dim=1)
+    best = (ratios - unstable_ratio).abs().argmin(dim=1)
+    return shifts.squeeze(1).gather(1, best.unsqueeze(1)).squeeze(1)
+
+
+def _generate_constraints(
+    L: Tensor,
+    U: Tensor,
+    num_constraints: int,
+    generator: torch.Generator,
+) -> Tuple[Tensor, Tensor, Tensor]:
+    """Generates `num_constraints` valid constraints `P.xi + P_hat.xi_hat - p <= 0`
+    over a layer's unstable neurons, as random nonnegative combinations (of 2
+    each) of the triangle-relaxation constraints:
+    `-xi_hat <= 0`, `xi - xi_hat <= 0` and `xi_hat - U/(U-L) (xi - L) <= 0`.
+
+    If there are no unstable neurons, or `num_constraints == 0`, a single
+    all-zeros (ie. vacuous) constraint is returned instead.
+    """
+    unstable_mask = (L < 0) & (U > 0)
+    num_unstable = int(unstable_mask.sum().item())
+    if num_unstable == 0 or num_constraints == 0:
+        return torch.zeros((1, num_unstable)), torch.zeros((1, num_unstable)), torch.zeros((1,))
+    if num_unstable == 1:
+        # `SolverInputs` squeezes `P`/`P_hat`, which would mis-shape a `(k, 1)` matrix.
+        num_constraints = 1
+
+    L, U = L[unstable_mask], U[unstable_mask]
+    slope = U / (U - L)
+    eye = torch.eye(num_unstable)
+    triangle_P = torch.cat([torch.zeros_like(eye), eye, -slope.diag()])
+    triangle_P_hat = torch.cat([-eye, -eye, eye])
+    triangle_p = torch.cat([torch.zeros(2 * num_unstable), -slope * L])
+
+    num_triangle = triangle_P.size(0)
+    weights = torch.zeros((num_constraints, num_triangle))
+    chosen = torch.randint(0, num_triangle, (num_constraints, 2), generator=generator)
+    weights.scatter_(1, chosen, torch.rand((num_constraints, 2), generator=generator))
+    return weights @ triangle_P, weights @ triangle_P_hat, weights @ triangle_p
@@ -23,6 +23,12 @@ class AdversarialCheckModel(nn.Module):
         - `y_g` is the "ground-truth" neuron's output
         - `y_i` is any other output-neuron.
         """
+        return bool(self.get_is_falsified(batched_concrete_inputs).item())
+
+    def get_is_falsified(self, batched_concrete_inputs: Tensor) -> Tensor:
+        """Same as `forward`, but returns the result as a 0-dim bool tensor on
+        the model's device, to avoid syncing with the device.
+        """
         first_layer = next(self.model.children())
         if isinstance(first_layer, nn.Conv2d):
             num_channels = first_layer.in_channels
@@ -40,4 +46,4 @@ class AdversarialCheckModel(nn.Module):
         assert ground_truth.shape == (num_batches, 1)
         assert rest_of_pred.shape == (num_batches, num_output - 1)
 
-        return bool(torch.any(rest_of_pred - ground_truth >= 0).item())
+        return torch.any(rest_of_pred - ground_truth >= 0)
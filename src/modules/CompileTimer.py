@@ -0,0 +1,65 @@
+import importlib
+import time
+from typing import Any, Callable, List
+
+from torch import Tensor
+from torch.fx import GraphModule
+
+
+class CompileTimer:
+    """`torch.compile` backend that compiles via inductor (ie. the default
+    backend), while accumulating the time spent compiling.
+
+    The forward graphs are compiled as soon as they're traced, but the backward
+    graphs are only compiled on their first backward pass, so both are timed
+    separately. Dynamo's tracing of the Python code isn't included, as it
+    happens before the backend is called.
+
+    It wraps inductor's private `compile_fx`, so check `is_supported()` before
+    using it, and use the plain `"inductor"` backend otherwise.
+    """
+
+    @staticmethod
+    def is_supported() -> bool:
+        """Returns whether this torch version has the inductor functions that
+        `CompileTimer` wraps."""
+        try:
+            compile_fx_module = importlib.import_module("torch._inductor.compile_fx")
+        except ImportError:
+            return False
+        return hasattr(compile_fx_module, "compile_fx") and hasattr(
+            compile_fx_module, "compile_fx_inner"
+        )
+
+    def __init__(self) -> None:
+        self.compile_time: float = 0.0
+        """Time spent compiling since the last `pop_compile_time`."""
+        self._is_compiling = False
+
+    def __call__(self, graph_module: GraphModule, example_inputs: List[Tensor]) -> Callable:
+        # Imported here, as importing inductor is slow.
+        from torch._inductor.compile_fx import compile_fx, compile_fx_inner
+
+        def timed_compile_fx_inner(*args: Any, **kwargs: Any) -> Any:
+            # Already timed if called within `compile_fx` (ie. for the forward graph).
+            if self._is_compiling:
+                return compile_fx_inner(*args, **kwargs)
+            return self._time(compile_fx_inner, *args, **kwargs)
+
+        return self._time(
+            compile_fx, graph_module, example_inputs, inner_compile=timed_compile_fx_inner
+        )
+
+    def pop_compile_time(self) -> float:
+        """Returns the time spent compiling since the last call, and resets it."""
+        compile_time, self.compile_time = self.compile_time, 0.0
+        return compile_time
+
+    def _time(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        start_time = time.perf_counter()
+        self._is_compiling = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._is_compiling = False
+            self.compile_time += time.perf_counter() - start_time
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import torch
+from torch import Tensor
+
+
+@dataclass
+class DualParameters:
+    """The dual parameters (`gamma`, `pi`, `alpha`) of the neurons solved for
+    in a layer, in the model's original neuron order.
+
+    As they're stored by neuron coordinates rather than by batch, they can be
+    used to warm-start the solve of a related problem (eg. a nearby input region,
+    or a slightly larger epsilon), whose stable/unstable neurons may differ.
+    """
+
+    neuron_indices: Tensor
+    """Shape `(num_solved,)`. Original indices of the solved neurons. Each neuron's
+    parameters are in 2 consecutive rows (minimising, then maximising)."""
+    gamma: Tensor
+    """Shape `(2 * num_solved, num_H_rows)`."""
+    pi_list: List[Tensor]
+    """`pi` of each intermediate layer, of shape `(2 * num_solved, num_P_rows)`."""
+    alpha_list: List[Tensor]
+    """`alpha` of each intermediate layer, of shape `(2 * num_solved, num_neurons)`, in
+    the model's original neuron order, whr the neurons that weren't unstable are `NaN`."""
+
+    @staticmethod
+    def cat(dual_parameters_list: Sequence["DualParameters"]) -> "DualParameters":
+        """Concatenates the dual parameters of the batches of the same layer."""
+        assert len(dual_parameters_list) > 0
+        return DualParameters(
+            neuron_indices=torch.cat([x.neuron_indices for x in dual_parameters_list]),
+            gamma=torch.cat([x.gamma for x in dual_parameters_list]),
+            pi_list=[torch.cat(x) for x in zip(*(x.pi_list for x in dual_parameters_list))],
+            alpha_list=[torch.cat(x) for x in zip(*(x.alpha_list for x in dual_parameters_list))],
+        )
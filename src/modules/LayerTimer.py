@@ -0,0 +1,54 @@
+import time
+from typing import List, Optional, Tuple
+
+from torch import Tensor, nn
+
+
+class LayerTimer:
+    """Times each solver layer's forward & backward pass of the latest epoch.
+
+    The forward pass of each layer is timed directly. For the backward pass,
+    the arrival time of the gradients of each layer's outputs is recorded via
+    tensor hooks. As the backward pass goes from the input layer to the output
+    layer, a layer's backward time is the time between its outputs' gradients
+    arriving, and its inputs' (ie. the next solver layer's outputs) gradients
+    arriving.
+
+    Timings are only meaningful on CPU, as CUDA kernels run asynchronously.
+    """
+
+    def __init__(self, num_layers: int) -> None:
+        self.num_layers = num_layers
+        self.forward_times: List[float] = [0.0] * num_layers
+        self._grad_arrival_times: List[Optional[float]] = [None] * num_layers
+
+    def time_forward(self, layer_index: int, layer: nn.Module, inputs: Tuple) -> Tuple:
+        """Runs `layer.forward(*inputs)` and records its time."""
+        start_time = time.perf_counter()
+        outputs = layer.forward(*inputs)
+        self.forward_times[layer_index] = time.perf_counter() - start_time
+
+        self._grad_arrival_times[layer_index] = None
+        for output in outputs:
+            if isinstance(output, Tensor) and output.requires_grad:
+                output.register_hook(lambda _, i=layer_index: self._record_grad_arrival(i))
+        return outputs
+
+    def _record_grad_arrival(self, layer_index: int) -> None:
+        # Take the latest of the outputs' gradients, as the layer's backward
+        # pass can only start after all of them have arrived.
+        self._grad_arrival_times[layer_index] = time.perf_counter()
+
+    def get_backward_times(self, backward_end_time: float) -> List[float]:
+        """Returns each layer's backward time, given the time (from
+        `time.perf_counter()`) at which the backward pass ended.
+        """
+        backward_times: List[float] = [0.0] * self.num_layers
+        next_arrival_time = backward_end_time
+        for i in range(self.num_layers - 1, -1, -1):
+            arrival_time = self._grad_arrival_times[i]
+            if arrival_time is None:
+                continue
+            backward_times[i] = max(next_arrival_time - arrival_time, 0.0)
+            next_arrival_time = arrival_time
+        return backward_times
@@ -0,0 +1,99 @@
+from typing import Collection, Dict, List, Tuple
+
+import torch
+from torch import Tensor, nn
+
+from ..preprocessing import preprocessing_utils, reorder_neurons
+from ..preprocessing.build import ModelLayers
+from ..preprocessing.solver_inputs import SolverInputs
+from .Solver import Solver
+
+
+class MultiInstanceSolver(nn.Module):
+    """Solver for multiple instances (ie. `SolverInputs` that share the same
+    model, but differ in their bounds/`P`/`P_hat`/`p`/`H`/`d`) at once.
+
+    Each instance has its own `Solver` (and thus its own compact `C`, batches,
+    etc.), and they're all computed in lockstep, such that the transposed
+    layers' matrix-multiplications of all the instances are done at once.
+
+    All the instances share 1 neuron order per layer (see
+    `reorder_neurons.get_shared_neuron_orders`), so their solver layers are
+    built from 1 shared set of transposed and reordered layers (per dtype),
+    and their `V`s stay in that order for the whole solve.
+    """
+
+    def __init__(self, inputs_list: List[SolverInputs], dtype: torch.dtype = torch.float):
+        """
+        Args:
+            inputs_list (List[SolverInputs]): Inputs of each instance to solve for. \
+                All of them must have the same model (ie. the first instance's model is used).
+            dtype (torch.dtype, optional): Dtype to compute in (see `Solver`). \
+                Defaults to torch.float.
+        """
+        super().__init__()
+        assert len(inputs_list) > 0, "Expected at least 1 instance."
+        for inputs in inputs_list:
+            assert len(inputs.L_list) == len(inputs_list[0].L_list)
+            for L, L_0 in zip(inputs.L_list, inputs_list[0].L_list):
+                assert L.shape == L_0.shape, "Expected all instances to have the same model."
+
+        masks_list = [preprocessing_utils.get_masks(x.L_list, x.U_list) for x in inputs_list]
+        neuron_orders = reorder_neurons.get_shared_neuron_orders(
+            [x[0] for x in masks_list], [x[1] for x in masks_list]
+        )
+        shared_model_layers: Dict[torch.dtype, ModelLayers] = {}
+        self.solvers = nn.ModuleList(
+            [Solver(x, dtype, neuron_orders, shared_model_layers) for x in inputs_list]
+        )
+        self.active_instances: List[int] = list(range(len(inputs_list)))
+        """Indices of the instances that are still being solved for (ie. not falsified)."""
+
+    @property
+    def num_layers(self) -> int:
+        return len(self.get_solver(0).sequential)
+
+    def get_solver(self, instance_index: int) -> Solver:
+        return self.solvers[instance_index]  # type: ignore
+
+    def drop_instances(self, instance_indices: Collection[int]) -> None:
+        """Stop solving for the instances `instance_indices` (eg. the falsified ones)."""
+        self.active_instances = [x for x in self.active_instances if x not in instance_indices]
+
+    def restore_instances(self, instance_indices: Collection[int]) -> None:
+        """Resume solving for the dropped instances `instance_indices` (eg. the
+        ones without neurons left to solve for in a batch of the layer).
+        """
+        self.active_instances = sorted({*self.active_instances, *instance_indices})
+
+    def clamp_parameters(self):
+        """Clamps all learnable parameters to their values' domains.
+
+        Specifically:
+        - `gamma >= 0`
+        - `pi >= 0`
+        - `0 <= alpha <= 1`
+        """
+        for i in self.active_instances:
+            self.get_solver(i).clamp_parameters()
+
+    def forward(self) -> List[Tuple[Tensor, Tensor]]:
+        """Returns the `(max_objective, theta)` of each active instance (see
+        `Solver.forward`), in the order of `active_instances`.
+        """
+        sequentials = [self.get_solver(i).sequential for i in self.active_instances]
+        outputs = [x[-1].forward() for x in sequentials]
+        for i in range(self.num_layers - 2, -1, -1):
+            # All the instances share layer `i + 1`'s transposed layer (which maps
+            # its neurons to layer `i`'s neurons), and the neuron orders.
+            V_next_list = [V for V, _ in outputs]
+            V_next_W_next = sequentials[0][i + 1].transposed_layer.forward(torch.cat(V_next_list))
+            V_next_W_next_list = V_next_W_next.split([x.size(0) for x in V_next_list])
+            outputs = [
+                x[i].forward_from_product(product, accum_sum)
+                for x, product, (_, accum_sum) in zip(sequentials, V_next_W_next_list, outputs)
+            ]
+
+        for instance_index, (max_objective, _) in zip(self.active_instances, outputs):
+            self.get_solver(instance_index).last_max_objective = max_objective.detach()
+        return outputs
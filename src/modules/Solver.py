@@ -1,26 +1,211 @@
-from typing import Tuple
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
 
 import torch
 from torch import Tensor, nn
 
+from ..preprocessing.build import ModelLayers, get_model_layers
+from ..preprocessing.preprocessing_utils import CompactC
 from ..preprocessing.solver_inputs import SolverInputs
 from .AdversarialCheckModel import AdversarialCheckModel
+from .CompileTimer import CompileTimer
+from .DualParameters import DualParameters
+from .solver_layers.intermediate_layer import IntermediateLayer
 from .solver_layers.SolverSequential import SolverSequential
 
 
 class Solver(nn.Module):
-    def __init__(self, inputs: SolverInputs):
+    def __init__(
+        self,
+        inputs: SolverInputs,
+        dtype: torch.dtype = torch.float,
+        neuron_orders: Optional[List[Optional[Tensor]]] = None,
+        shared_model_layers: Optional[Dict[torch.dtype, ModelLayers]] = None,
+    ):
         """
         Args:
             inputs (SolverInputs): Inputs to solve for.
+            dtype (torch.dtype, optional): Dtype to compute in. The learnable parameters \
+                and transposed layers are in `dtype`, while the bounds and the objective \
+                are accumulated in at least float32 (see `SolverLayer.set_compute_dtype`). \
+                Defaults to torch.float.
+            neuron_orders (Optional[List[Optional[Tensor]]], optional): Order of each \
+                layer's neurons, kept even when the bounds are tightened (eg. shared \
+                by multiple instances, see `reorder_neurons.get_shared_neuron_orders`). \
+                Defaults to None (ie. ordered by the current bounds' own masks).
+            shared_model_layers (Optional[Dict[torch.dtype, ModelLayers]], optional): \
+                `ModelLayers` of each dtype shared by the solvers with the same model \
+                and `neuron_orders`, whr the solver adds the ones it has to build. \
+                Defaults to None (ie. not shared).
         """
         super().__init__()
-        self.sequential = SolverSequential(inputs)
+        self.inputs = inputs
+        self.dtype = dtype
+        self.neuron_orders = neuron_orders
+        self.shared_model_layers = shared_model_layers
+        assert shared_model_layers is None or neuron_orders is not None
+        self.sequential = self._build_sequential(dtype)
         self.adv_check_model = AdversarialCheckModel(inputs.model, inputs.ground_truth_neuron_index)
+        self._compiled_forward: Optional[Callable[[], Tuple[Tensor, Tensor]]] = None
+        self._is_compile_failed = False
+        self.compile_timer = CompileTimer()
+        self._float64_sequential: Optional[SolverSequential] = None
+        """Float64 solver layers of `get_float64_objective`, built on its first call."""
 
-    def reset_and_solve_for_layer(self, layer_index: int) -> None:
-        """Reset all parameters and set to solve for `layer_index`."""
-        self.sequential.solve_for_layer(layer_index)
+        self.initial_dual_parameters: Dict[int, DualParameters] = {}
+        """Dual parameters of each layer to warm-start its solve with."""
+        self.dual_parameters: Dict[int, DualParameters] = {}
+        """Dual parameters of each solved layer, if `TrainingConfig.keep_dual_parameters=True`."""
+        self.adv_check_seen_patterns: Optional[Tensor] = None
+        """Bit-packed sign patterns of theta already checked while solving the current \
+        layer (see `AdversarialChecker`), such that they're cached across its batches."""
+
+    def _build_sequential(
+        self, dtype: torch.dtype, device: Optional[torch.device] = None
+    ) -> SolverSequential:
+        """Builds the solver layers of `self.inputs` computing in `dtype` on
+        `device`, with the shared `ModelLayers` of `dtype` (if any).
+        """
+        model_layers = None
+        if self.shared_model_layers is not None:
+            model_layers = self.shared_model_layers.get(dtype)
+        sequential = SolverSequential(self.inputs, self.neuron_orders, model_layers)
+        if device is not None:
+            sequential = sequential.to(device)
+        sequential.set_compute_dtype(dtype)
+        if self.shared_model_layers is not None and model_layers is None:
+            self.shared_model_layers[dtype] = get_model_layers(list(sequential))
+        return sequential
+
+    def set_compiled(self, is_compiled: bool) -> None:
+        """Sets whether to run the forward pass (and thus also its backward pass)
+        via `torch.compile`. The compilation itself only happens lazily on the
+        first forward pass, and its time is accumulated in `compile_timer`.
+
+        The batch dim is marked as dynamic, and the compiled code reads the
+        solver layers from `self.sequential`, so the compiled graphs are reused
+        across the batches, the layer solves and `update_bounds`. If compiling
+        fails, a warning is raised and the solver stays in eager mode (see
+        `fall_back_to_eager`). If the torch version doesn't support `CompileTimer`,
+        the default inductor backend is used, without timing the compilation.
+        """
+        if not is_compiled or self._is_compile_failed:
+            self._compiled_forward = None
+        elif self._compiled_forward is None:
+            self._compiled_forward = torch.compile(
+                self._forward_sequential,
+                dynamic=True,
+                backend=self.compile_timer if CompileTimer.is_supported() else "inductor",
+            )
+
+    @property
+    def is_compiled(self) -> bool:
+        return self._compiled_forward is not None
+
+    def _forward_sequential(self) -> Tuple[Tensor, Tensor]:
+        return self.sequential.forward()
+
+    def reset_and_solve_for_layer(
+        self, layer_index: int, start: int = 0, end: Optional[int] = None
+    ) -> None:
+        """Reset all parameters and set to solve for `layer_index`.
+
+        Only the neurons `[start:end]` (of the `get_num_neurons_to_solve(layer_index)`
+        neurons to solve for) are batched together, so that wide layers can be
+        solved in multiple smaller batches.
+        """
+        self.sequential.solve_for_layer(layer_index, start, end)
+        if start == 0:  # 1st batch of the layer.
+            self.adv_check_seen_patterns = None
+        if layer_index in self.initial_dual_parameters:
+            self.set_dual_parameters(self.initial_dual_parameters[layer_index])
+
+    def get_dual_parameters(self) -> DualParameters:
+        """Returns the dual parameters of the batches being solved for, in the
+        model's original neuron order (on CPU).
+        """
+        sequential = self.sequential
+        solve_layer = sequential[sequential.solve_layer_index]
+        alpha_list: List[Tensor] = []
+        for layer in list(sequential)[1:-1]:
+            assert isinstance(layer, IntermediateLayer)
+            assert not layer.has_stable_relaxed, "Expected the layers' own neuron orders."
+            alpha = torch.full((layer.num_batches, layer.num_neurons), torch.nan).to(layer.alpha)
+            alpha[:, layer.get_original_indices(layer.unstable_indices)] = layer.alpha.detach()
+            alpha_list.append(alpha.cpu())
+
+        return DualParameters(
+            neuron_indices=solve_layer.get_original_indices(sequential.solve_neuron_indices).cpu(),
+            gamma=sequential[-1].gamma.detach().cpu(),
+            pi_list=[x.pi.detach().cpu() for x in list(sequential)[1:-1]],  # type: ignore
+            alpha_list=alpha_list,
+        )
+
+    def set_dual_parameters(self, dual_parameters: DualParameters) -> None:
+        """Sets the dual parameters of the batches being solved for, to those of
+        the same neurons in `dual_parameters` (eg. from a related problem's solve).
+
+        The batches are matched by the solved neurons' original indices, and
+        `alpha` by the intermediate layers' original neuron indices. Parameters
+        without a match (eg. neurons that weren't solved for / unstable before,
+        or `pi` with a different num. of `P` rows) keep their initial values.
+        """
+        sequential = self.sequential
+        solve_layer = sequential[sequential.solve_layer_index]
+        device = solve_layer.L.device
+        assert len(dual_parameters.pi_list) == len(sequential) - 2
+
+        # Map each current batch to the matching batch of `dual_parameters`.
+        lookup = torch.full((solve_layer.num_neurons,), -1, dtype=torch.long, device=device)
+        lookup[dual_parameters.neuron_indices.to(device)] = torch.arange(
+            dual_parameters.neuron_indices.size(0), device=device
+        )
+        matches = lookup[solve_layer.get_original_indices(sequential.solve_neuron_indices)]
+        has_match = matches >= 0
+        if not bool(has_match.any().item()):
+            return
+        row_offsets = torch.tensor([0, 1], device=device)
+        rows = (2 * torch.where(has_match)[0].unsqueeze(1) + row_offsets).flatten()
+        matched_rows = (2 * matches[has_match].unsqueeze(1) + row_offsets).flatten()
+
+        with torch.no_grad():
+            output_layer = sequential[-1]
+            gamma = dual_parameters.gamma.to(output_layer.gamma)
+            if gamma.size(1) == output_layer.gamma.size(1):
+                output_layer.gamma[rows] = gamma[matched_rows]
+
+            for layer, pi, alpha in zip(
+                list(sequential)[1:-1], dual_parameters.pi_list, dual_parameters.alpha_list
+            ):
+                assert isinstance(layer, IntermediateLayer)
+                assert not layer.has_stable_relaxed, "Expected the layers' own neuron orders."
+                if pi.size(1) == layer.pi.size(1):
+                    layer.pi[rows] = pi.to(layer.pi)[matched_rows]
+
+                unstable_indices = layer.get_original_indices(layer.unstable_indices)
+                matched_alpha = alpha.to(layer.alpha)[matched_rows][:, unstable_indices]
+                layer.alpha[rows] = torch.where(
+                    matched_alpha.isnan(), layer.alpha[rows], matched_alpha
+                )
+
+    def update_bounds(self, layer_index: int, new_L: Tensor, new_U: Tensor) -> None:
+        """Write the tightened bounds of layer `layer_index` back into the solver
+        layers, so that they're used when solving for the subsequent layers.
+
+        The solver layers are rebuilt, such that the stable/unstable masks,
+        neuron orders (unless they're given, see `__init__`) and relaxations are
+        recomputed from the tightened bounds. Neurons that became stable are thus
+        no longer solved for.
+        """
+        device = self.sequential[0].L.device
+        self.inputs = self.inputs.with_tightened_bounds(layer_index, new_L, new_U)
+        self.sequential = self._build_sequential(self.dtype, device)
+        self._float64_sequential = None
+        self.adv_check_seen_patterns = None  # The concrete inputs depend on the bounds.
+
+    def get_num_neurons_to_solve(self, layer_index: int) -> int:
+        """Returns the number of neurons that need to be solved for in layer `layer_index`."""
+        return self.sequential.get_solve_indices(layer_index).size(0)
 
     def clamp_parameters(self):
         """Clamps all learnable parameters to their values' domains.
@@ -36,23 +221,128 @@ class Solver(nn.Module):
         """Returns the computed objective function (that needs to be maximised)
         and theta values in the form: `(max_objective, theta)`.
         """
-        max_objective, theta = self.sequential.forward()
-        self.last_max_objective = max_objective.detach()
+        max_objective, theta = self._compiled_forward_or_eager()
+        active_batch_indices = self.sequential.active_batch_indices
+        if active_batch_indices is None:
+            self.last_max_objective = max_objective.detach()
+        else:
+            # Frozen batches keep their objective values from when they were frozen.
+            self.last_max_objective = self.last_max_objective.index_copy(
+                0, active_batch_indices, max_objective.detach()
+            )
         return max_objective, theta
 
-    def get_updated_bounds(self, layer_index: int) -> Tuple[Tensor, Tensor]:
-        """Returns `(new_lower_bounds, new_upper_bounds)` for layer `layer_index`."""
-        assert self.sequential.solve_coords[0][0] == layer_index
+    def _compiled_forward_or_eager(self) -> Tuple[Tensor, Tensor]:
+        compiled_forward = self._compiled_forward
+        if compiled_forward is None:
+            return self.sequential.forward()
+        try:
+            return compiled_forward()
+        except Exception as e:
+            self.fall_back_to_eager(e)
+            return self.sequential.forward()
+
+    def fall_back_to_eager(self, error: Exception) -> None:
+        """Stops compiling the solver, after compiling it failed with `error`
+        (eg. unsupported platform, or missing C++ compiler).
+
+        As the backward graphs are only compiled on their first backward pass,
+        this is also called by the training loop if that fails.
+        """
+        warnings.warn(f"Failed to compile the solver, falling back to eager mode. Error: {error}")
+        self._compiled_forward = None
+        self._is_compile_failed = True
+
+    def keep_batches(self, indices: Tensor) -> None:
+        """Keep only the active batches `indices` (relative to the currently
+        active batches), freezing the rest. Frozen batches are excluded from
+        subsequent forward passes, but still keep their last objective values
+        in `last_max_objective`.
+
+        To keep the frozen batches' parameters consistent with their objective
+        values, it should be called before the parameters are updated after the
+        last forward pass (eg. between the backward pass and the optimizer step).
+        """
+        self.sequential.keep_batches(indices)
+
+    def restore_all_batches(self) -> None:
+        """Restore all the batches frozen by `keep_batches`."""
+        self.sequential.restore_all_batches()
+
+    def get_float64_objective(self) -> Tensor:
+        """Returns the objective of all the batches, evaluated once more in
+        float64 at the current parameters (clamped to their domains), with
+        float64 solver layers built from the original inputs.
+
+        Thus the objective isn't affected by the rounding errors of solving in
+        lower precision, nor by the rounding of the weights/`P`/`P_hat` to the
+        compute dtype.
+
+        The float64 solver layers are only built once, until they're invalidated
+        by `update_bounds`.
+        """
+        sequential = self.sequential
+        assert sequential.active_batch_indices is None, "Expected all batches to be active."
+        if self._float64_sequential is None:
+            self._float64_sequential = self._build_sequential(torch.float64, sequential[0].L.device)
+        float64_sequential = self._float64_sequential
+
+        with torch.no_grad():
+            for layer, float64_layer in zip(sequential, float64_sequential):
+                float64_layer.set_C_and_frozen_parameters(
+                    CompactC(layer.num_batches, layer.C_neuron_indices, layer.C_signs),
+                    dict(layer.named_parameters(recurse=False)),
+                )
+            float64_sequential.clamp_parameters()
+            max_objective, _ = float64_sequential.forward()
+        return max_objective
+
+    def get_updated_bounds(
+        self,
+        layer_index: int,
+        prev_L: Optional[Tensor] = None,
+        prev_U: Optional[Tensor] = None,
+        finalize_in_float64: bool = False,
+    ) -> Tuple[Tensor, Tensor]:
+        """Returns `(new_lower_bounds, new_upper_bounds)` for layer `layer_index`,
+        with the neurons in the model's original order.
+
+        Args:
+            layer_index (int): Index of the layer that was solved for.
+            prev_L (Optional[Tensor], optional): Lower bounds to update on top of \
+                (eg. the results of the previous batches of the same layer). \
+                Defaults to the layer's initial lower bounds.
+            prev_U (Optional[Tensor], optional): Upper bounds to update on top of \
+                (eg. the results of the previous batches of the same layer). \
+                Defaults to the layer's initial upper bounds.
+            finalize_in_float64 (bool, optional): Whether to compute the bounds from \
+                the objective evaluated once more in float64 (see `get_float64_objective`), \
+                instead of `last_max_objective`, at the cost of 1 extra forward pass. \
+                The returned bounds are then float64, to be rounded outwards when \
+                converting to a lower precision (see `to_float32_rounded`). Defaults to False.
+        """
+        assert self.sequential.solve_layer_index == layer_index
+        layer = self.sequential[layer_index]
+        objective = self.last_max_objective
+        if finalize_in_float64 and self.dtype != torch.float64:
+            objective = self.get_float64_objective()
+
+        # Clone the tensors to avoid modifying the original tensors.
+        # The bounds are updated in the layer's neuron order.
+        new_L: Tensor = layer.apply_neuron_order(prev_L) if prev_L is not None else layer.L
+        new_U: Tensor = layer.apply_neuron_order(prev_U) if prev_U is not None else layer.U
+        dtype = torch.promote_types(new_L.dtype, objective.dtype)
+        new_L = new_L.detach().to(dtype, copy=True)
+        new_U = new_U.detach().to(dtype, copy=True)
 
-        # Clone the tensors to avoid modifying the original tensors
-        new_L: Tensor = self.sequential[layer_index].L.clone().detach()
-        new_U: Tensor = self.sequential[layer_index].U.clone().detach()
+        # Even batches minimise, odd batches maximise.
+        indices = self.sequential.solve_neuron_indices
+        min_objective = objective[0::2].to(dtype)
+        max_objective = objective[1::2].to(dtype)
 
-        # Iterate over the solve_coords
-        for i, (_, coord) in enumerate(self.sequential.solve_coords):
-            # Replace bounds only if they're better than the initial bounds.
-            new_L[coord] = torch.max(new_L[coord], self.last_max_objective[2 * i])
-            # New upper bounds is negation of objective func.
-            new_U[coord] = torch.min(new_U[coord], -self.last_max_objective[2 * i + 1])
+        # Replace bounds only if they're better than the initial bounds.
+        new_L[indices] = torch.max(new_L[indices], min_objective)
+        # New upper bounds is negation of objective func.
+        new_U[indices] = torch.min(new_U[indices], -max_objective)
 
-        return new_L, new_U
+        return layer.restore_neuron_order(new_L), layer.restore_neuron_order(new_U)
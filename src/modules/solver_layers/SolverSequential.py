@@ -1,11 +1,12 @@
-from typing import Iterator, List, Literal, Tuple, overload
+from typing import Dict, Iterator, List, Literal, Optional, Tuple, overload
 
 import torch
 from torch import Tensor, nn
 
 from ...preprocessing import preprocessing_utils
-from ...preprocessing.build import build
+from ...preprocessing.build import ModelLayers, build
 from ...preprocessing.solver_inputs import SolverInputs
+from ..LayerTimer import LayerTimer
 from .base_class import SolverLayer
 from .input_layer import InputLayer
 from .intermediate_layer import IntermediateLayer
@@ -17,22 +18,114 @@ class SolverSequential(nn.ModuleList):
     output-layer to the intermediate-layers then to the input-layer.
     """
 
-    def __init__(self, inputs: SolverInputs) -> None:
-        self.layers = build(inputs)
+    def __init__(
+        self,
+        inputs: SolverInputs,
+        neuron_orders: Optional[List[Optional[Tensor]]] = None,
+        model_layers: Optional[ModelLayers] = None,
+    ) -> None:
+        """
+        Args:
+            inputs (SolverInputs): Inputs to solve for.
+            neuron_orders (Optional[List[Optional[Tensor]]], optional): Order of each \
+                layer's neurons (see `build()`). Defaults to None.
+            model_layers (Optional[ModelLayers], optional): Transposed layers and \
+                `Bias` modules to share (see `build()`). Defaults to None.
+        """
+        self.layers = build(inputs, neuron_orders, model_layers)
         super().__init__(self.layers)
-
-    def solve_for_layer(self, layer_index: int) -> None:
-        C_list, self.solve_coords = preprocessing_utils.get_C_for_layer(
-            layer_index, self.unstable_masks
+        self.layer_timer: Optional[LayerTimer] = None
+
+    def set_compute_dtype(self, dtype: torch.dtype) -> None:
+        """Sets the dtype of all layers to compute in (see `SolverLayer.set_compute_dtype`)."""
+        for layer in self:
+            layer.set_compute_dtype(dtype)
+
+    def solve_for_layer(self, layer_index: int, start: int = 0, end: Optional[int] = None) -> None:
+        self.solve_layer_index: int = layer_index
+        self.solve_neuron_indices: Tensor = self.get_solve_indices(layer_index)[start:end]
+        C_list = preprocessing_utils.get_C_for_layer(
+            layer_index, len(self), self.solve_neuron_indices
         )
         for i in range(len(self)):
             self[i].set_C_and_reset_parameters(C_list[i])
 
+        self.active_batch_indices: Optional[Tensor] = None
+        self._full_parameters: Dict[str, Tensor] = {}
+
+    def keep_batches(self, indices: Tensor) -> None:
+        """Keep only the active batches `indices` (relative to the currently
+        active batches), and freeze the rest by dropping them from the learnable
+        parameters and `C`.
+
+        The frozen batches' parameters are kept aside, and are restored via
+        `restore_all_batches`. The active batches' gradients are kept, so that
+        it can be called between the backward pass and the optimizer step.
+        """
+        active_batch_indices = self.active_batch_indices
+        if active_batch_indices is None:
+            active_batch_indices = torch.arange(self[0].num_batches, device=indices.device)
+
+        for name, param in self.named_parameters():
+            if not param.requires_grad:  # Skip the frozen weights of the transposed layers.
+                continue
+            if name not in self._full_parameters:
+                self._full_parameters[name] = param.detach().clone()
+            else:
+                self._full_parameters[name][active_batch_indices] = param.detach()
+            param.data = param.data[indices]
+            if param.grad is not None:
+                param.grad = param.grad[indices]
+
+        for layer in self:
+            layer.keep_batches(indices)
+        self.active_batch_indices = active_batch_indices[indices]
+
+    def restore_all_batches(self) -> None:
+        """Restore all the batches frozen by `keep_batches`, such that all the
+        batches of the layer being solved for are active again.
+        """
+        active_batch_indices = self.active_batch_indices
+        if active_batch_indices is None:
+            return
+
+        for name, param in self.named_parameters():
+            if name not in self._full_parameters:
+                continue
+            full_param = self._full_parameters[name]
+            full_param[active_batch_indices] = param.detach()
+            param.data = full_param
+            param.grad = None
+
+        C_list = preprocessing_utils.get_C_for_layer(
+            self.solve_layer_index, len(self), self.solve_neuron_indices
+        )
+        for i in range(len(self)):
+            self[i].set_C(C_list[i])
+
+        self.active_batch_indices = None
+        self._full_parameters = {}
+
+    def get_solve_indices(self, layer_index: int) -> Tensor:
+        """Returns the indices of the neurons to solve for in layer `layer_index`.
+
+        If `layer_index == 0`, it's all the input neurons (irregardless of
+        whether they're unstable), else it's only the unstable neurons.
+        """
+        layer = self[layer_index]
+        if layer_index == 0:
+            return torch.arange(layer.num_neurons, device=layer.L.device)
+        return layer.unstable_indices
+
     def forward(self) -> Tuple[Tensor, Tensor]:
+        layer_timer = self.layer_timer
         x = ()
         for i in range(len(self) - 1, -1, -1):
             layer = self[i]
-            x = layer.forward(*x)  # type: ignore
+            if layer_timer is None:
+                x = layer.forward(*x)  # type: ignore
+            else:
+                x = layer_timer.time_forward(i, layer, x)
         return x  # type: ignore
 
     def clamp_parameters(self):
@@ -54,13 +147,15 @@ class SolverSequential(nn.ModuleList):
     def __getitem__(self, i: int) -> SolverLayer:
         return super().__getitem__(i)  # type: ignore
 
+    # The properties below are in the model's original neuron order, instead of
+    # the order of the neurons in the layers (see `build()`).
     @property
     def L_list(self) -> List[Tensor]:
-        return [x.L for x in self]
+        return [x.restore_neuron_order(x.L) for x in self]
 
     @property
     def U_list(self) -> List[Tensor]:
-        return [x.U for x in self]
+        return [x.restore_neuron_order(x.U) for x in self]
 
     @property
     def H(self) -> Tensor:
@@ -68,16 +163,16 @@ class SolverSequential(nn.ModuleList):
 
     @property
     def stably_act_masks(self) -> List[Tensor]:
-        return [x.stably_act_mask for x in self]
+        return [x.restore_neuron_order(x.stably_act_mask) for x in self]
 
     @property
     def stably_deact_masks(self) -> List[Tensor]:
-        return [x.stably_deact_mask for x in self]
+        return [x.restore_neuron_order(x.stably_deact_mask) for x in self]
 
     @property
     def unstable_masks(self) -> List[Tensor]:
-        return [x.unstable_mask for x in self]
+        return [x.restore_neuron_order(x.unstable_mask) for x in self]
 
     @property
     def C_list(self) -> List[Tensor]:
-        return [x.C for x in self]
+        return [x.restore_neuron_order(x.C) for x in self]
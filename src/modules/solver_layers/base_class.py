@@ -1,7 +1,13 @@
 from abc import ABC, abstractmethod
+from typing import Dict, Optional
 
+import torch
 from torch import Tensor, nn
 
+from ...preprocessing import reorder_neurons
+from ...preprocessing.class_definitions import Bias
+from ...preprocessing.preprocessing_utils import CompactC
+
 
 class SolverLayer(ABC, nn.Module):
     """Abstract base class for all solver layers.
@@ -17,30 +23,124 @@ class SolverLayer(ABC, nn.Module):
         stably_act_mask: Tensor,
         stably_deact_mask: Tensor,
         unstable_mask: Tensor,
-        C: Tensor,
+        C: CompactC,
+        neuron_order: Optional[Tensor] = None,
     ) -> None:
         super().__init__()
+        self.compute_dtype: torch.dtype = torch.float
         self.L: Tensor
         self.U: Tensor
         self.stably_act_mask: Tensor
         self.stably_deact_mask: Tensor
         self.unstable_mask: Tensor
-        self.C: Tensor
+        self.unstable_indices: Tensor
         self.register_buffer("L", L)
         self.register_buffer("U", U)
         self.register_buffer("stably_act_mask", stably_act_mask)
         self.register_buffer("stably_deact_mask", stably_deact_mask)
         self.register_buffer("unstable_mask", unstable_mask)
-        self.register_buffer("C", C)
+        self.register_buffer("unstable_indices", torch.where(unstable_mask)[0])
+        self.set_C(C)
+
+        # Order of this layer's neurons relative to the model's, as set by `build()`.
+        self.neuron_order: Optional[Tensor]
+        self.register_buffer("neuron_order", neuron_order)
+
+    def restore_neuron_order(self, X: Tensor) -> Tensor:
+        """Restores the model's original order of this layer's neurons on the last dim of `X`."""
+        return reorder_neurons.undo_order(X, self.neuron_order)
+
+    def apply_neuron_order(self, X: Tensor) -> Tensor:
+        """Reorders the neurons on the last dim of `X` (in the model's original
+        order) to this layer's order.
+        """
+        return reorder_neurons.apply_order(X, self.neuron_order)
+
+    def get_original_indices(self, indices: Tensor) -> Tensor:
+        """Maps the indices of this layer's neurons to their indices in the
+        model's original order."""
+        return indices if self.neuron_order is None else self.neuron_order[indices]
+
+    def set_compute_dtype(self, dtype: torch.dtype) -> None:
+        """Sets the dtype to compute in. The transposed layers and the tensors
+        used in the large matrix-multiplications are converted to `dtype`, while
+        the bounds and the tensors only used in the reductions into the
+        objective are converted to `accum_dtype`.
+
+        The learnable parameters are only created in `dtype` on their next reset
+        (ie. `set_C_and_reset_parameters`).
+        """
+        self.compute_dtype = dtype
+        self.L = self.L.to(self.accum_dtype)
+        self.U = self.U.to(self.accum_dtype)
+        for module in self.children():
+            module.to(self.accum_dtype if isinstance(module, Bias) else dtype)
+
+    @property
+    def accum_dtype(self) -> torch.dtype:
+        """Dtype to accumulate the objective in, ie. `compute_dtype` but at least float32."""
+        return torch.promote_types(self.compute_dtype, torch.float)
+
+    def set_C_and_reset_parameters(self, C: CompactC) -> None:
+        """Set `C` (in its compact form) and reset learnable parameters."""
+        self.set_C(C)
 
-    def set_C_and_reset_parameters(self, C: Tensor) -> None:
-        """Set `C` tensor and reset learnable parameters."""
-        self.register_buffer("C", C)
+    def set_C_and_frozen_parameters(self, C: CompactC, parameters: Dict[str, Tensor]) -> None:
+        """Set `C` (in its compact form), and set the learnable parameters to
+        frozen copies of `parameters` in the compute dtype, instead of resetting
+        them (eg. to evaluate another layer's parameters in another dtype).
+        """
+        self.set_C(C)
+        for name, value in parameters.items():
+            frozen_value = value.detach().to(self.compute_dtype, copy=True)
+            setattr(self, name, nn.Parameter(frozen_value, requires_grad=False))
+
+    def set_C(self, C: CompactC) -> None:
+        """Set `C` (in its compact form) without resetting the learnable parameters."""
+        self._num_batches: int = C.num_batches
+        self.C_neuron_indices: Optional[Tensor]
+        self.C_signs: Optional[Tensor]
+        self.register_buffer("C_neuron_indices", C.neuron_indices)
+        self.register_buffer(
+            "C_signs", C.signs.to(self.compute_dtype) if C.signs is not None else None
+        )
+
+    def keep_batches(self, indices: Tensor) -> None:
+        """Keep only the batches `indices` of `C` (and of any other per-batch
+        non-learnable state), dropping the rest.
+        """
+        C_neuron_indices, C_signs = self.C_neuron_indices, self.C_signs
+        self.set_C(
+            CompactC(
+                num_batches=indices.size(0),
+                neuron_indices=C_neuron_indices[indices] if C_neuron_indices is not None else None,
+                signs=C_signs[indices] if C_signs is not None else None,
+            )
+        )
+
+    def subtract_C(self, X: Tensor) -> Tensor:
+        """Returns `X - C`, for `X` of shape `(num_batches, num_neurons)`.
+
+        The non-zero elements of `C` are scattered into `X`, or if `C` is all
+        zeros (ie. this isn't the layer being solved for), `X` is returned as is.
+        """
+        if self.C_neuron_indices is None or self.C_signs is None:
+            return X
+        return X.scatter_add(1, self.C_neuron_indices.unsqueeze(1), -self.C_signs.unsqueeze(1))
+
+    @property
+    def C(self) -> Tensor:
+        """The dense `C` matrix of shape `(num_batches, num_neurons)`.
+
+        Only used for inspection, as the solving uses the compact form of `C`.
+        """
+        C = torch.zeros((self.num_batches, self.num_neurons), dtype=self.compute_dtype)
+        return -self.subtract_C(C.to(self.L.device))
 
     @property
     def num_batches(self) -> int:
         """The number of batches this layer is set to solve for."""
-        return self.C.size(0)
+        return self._num_batches
 
     @property
     def num_neurons(self) -> int:
@@ -50,7 +150,7 @@ class SolverLayer(ABC, nn.Module):
     @property
     def num_unstable(self) -> int:
         """The number of unstable neurons this layer has."""
-        return int(self.unstable_mask.sum().item())
+        return self.unstable_indices.size(0)
 
     @abstractmethod
     def clamp_parameters(self) -> None:
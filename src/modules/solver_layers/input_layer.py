@@ -4,6 +4,7 @@ import torch.nn.functional as F
 from torch import Tensor
 from typing_extensions import override
 
+from ...preprocessing.preprocessing_utils import CompactC
 from ...preprocessing.transpose import UnaryForward
 from .base_class import SolverLayer
 
@@ -22,17 +23,23 @@ class InputLayer(SolverLayer):
         stably_act_mask: Tensor,
         stably_deact_mask: Tensor,
         unstable_mask: Tensor,
-        C: Tensor,
+        C: CompactC,
         transposed_layer: UnaryForward,
     ) -> None:
         super().__init__(L, U, stably_act_mask, stably_deact_mask, unstable_mask, C)
         self.transposed_layer = transposed_layer
 
     def forward(self, V_1: Tensor, accum_sum: Tensor) -> Tuple[Tensor, Tensor]:
-        L, U, C, transposed_layer = self.L, self.U, self.C, self.transposed_layer
+        return self.forward_from_product(self.transposed_layer.forward(V_1), accum_sum)
 
-        theta: Tensor = C - transposed_layer.forward(V_1)
-        max_objective = accum_sum + (F.relu(theta) @ L) - (F.relu(-theta) @ U)
+    def forward_from_product(self, V_1_W_1: Tensor, accum_sum: Tensor) -> Tuple[Tensor, Tensor]:
+        """Same as `forward`, but from `V_1_W_1 = transposed_layer.forward(V_1)` (eg. as
+        computed for many instances at once, by `MultiInstanceSolver`).
+        """
+        L, U = self.L, self.U
+
+        theta: Tensor = -self.subtract_C(V_1_W_1)
+        max_objective = accum_sum + (F.relu(theta).to(L) @ L) - (F.relu(-theta).to(U) @ U)
         return max_objective, theta.detach()
 
     @override
@@ -1,10 +1,11 @@
-from typing import Tuple
+from typing import Optional, Tuple
 
 import torch
 from torch import Tensor, nn
 from typing_extensions import override
 
 from ...preprocessing.class_definitions import Bias
+from ...preprocessing.preprocessing_utils import CompactC
 from ...preprocessing.transpose import UnaryForward
 from ..solver_utils import bracket_minus, bracket_plus
 from .base_class import SolverLayer
@@ -24,73 +25,162 @@ class IntermediateLayer(SolverLayer):
         stably_act_mask: Tensor,
         stably_deact_mask: Tensor,
         unstable_mask: Tensor,
-        C: Tensor,
+        C: CompactC,
         transposed_layer: UnaryForward,
         bias_module: Bias,
         transposed_layer_next: UnaryForward,
         P: Tensor,
         P_hat: Tensor,
         p: Tensor,
+        neuron_order: Optional[Tensor] = None,
     ) -> None:
-        super().__init__(L, U, stably_act_mask, stably_deact_mask, unstable_mask, C)
+        super().__init__(L, U, stably_act_mask, stably_deact_mask, unstable_mask, C, neuron_order)
         self.transposed_layer = transposed_layer
         self.transposed_layer_next = transposed_layer_next
         self.bias_module = bias_module
 
+        # The neurons are ordered such that they start with a contiguous range of
+        # stably-activated neurons, then of stably-deactivated neurons, followed by
+        # the "relaxed" range `[unstable_start:]` that contains all the unstable
+        # neurons. With the layer's own neuron order, the relaxed range only has
+        # unstable neurons. With a neuron order shared by multiple instances (see
+        # `reorder_neurons.get_shared_neuron_orders`), it may also have stable
+        # neurons, whose relaxations are then exact (ie. `alpha` is fixed to 1 if
+        # stably-activated, or to 0 if stably-deactivated).
+        self.num_stably_act: int = _get_leading_run_length(stably_act_mask)
+        self.unstable_start: int = self.num_stably_act + _get_leading_run_length(
+            stably_deact_mask[self.num_stably_act :]
+        )
+        assert not torch.any(unstable_mask[: self.unstable_start])
+        self.has_stable_relaxed: bool = self.num_relaxed > self.num_unstable
+        if self.has_stable_relaxed:
+            # Expand the columns of `P`/`P_hat` to the relaxed range, with zeros
+            # for its stable neurons.
+            relaxed_unstable_mask = unstable_mask[self.unstable_start :]
+            P = P.new_zeros((P.size(0), self.num_relaxed)).index_copy_(
+                1, torch.where(relaxed_unstable_mask)[0], P
+            )
+            P_hat = P_hat.new_zeros((P_hat.size(0), self.num_relaxed)).index_copy_(
+                1, torch.where(relaxed_unstable_mask)[0], P_hat
+            )
+
         self.P: Tensor
         self.P_hat: Tensor
         self.p: Tensor
         self.register_buffer("P", P)
         self.register_buffer("P_hat", P_hat)
         self.register_buffer("p", p)
+        self.set_relaxation_constants()
+
+    @property
+    def num_relaxed(self) -> int:
+        """The number of neurons in the relaxed range (ie. the size of `alpha`'s last dim)."""
+        return self.num_neurons - self.unstable_start
+
+    @override
+    def set_compute_dtype(self, dtype: torch.dtype) -> None:
+        super().set_compute_dtype(dtype)
+        self.P = self.P.to(dtype)
+        self.P_hat = self.P_hat.to(dtype)
+        self.p = self.p.to(self.accum_dtype)
+        self.set_relaxation_constants()
+
+    def set_relaxation_constants(self) -> None:
+        """Computes the constants of the relaxed neurons' relaxations, which
+        don't change while solving, so they're only computed once per dtype."""
+        U_relaxed = self.U[self.unstable_start :]
+        L_relaxed = self.L[self.unstable_start :]
+        slope = U_relaxed / (U_relaxed - L_relaxed)
+        intercept = U_relaxed * L_relaxed / (U_relaxed - L_relaxed)
+        if self.has_stable_relaxed:
+            # Exact relaxations of the stable neurons (ie. `V = V_hat` if
+            # stably-activated, or `V = 0` if stably-deactivated).
+            act_mask = self.stably_act_mask[self.unstable_start :]
+            stable_mask = ~self.unstable_mask[self.unstable_start :]
+            slope = torch.where(stable_mask, act_mask.to(slope), slope)
+            intercept = torch.where(stable_mask, torch.zeros_like(intercept), intercept)
+            self.alpha_is_fixed: Tensor
+            self.fixed_alpha: Tensor
+            self.register_buffer("alpha_is_fixed", stable_mask, persistent=False)
+            self.register_buffer("fixed_alpha", act_mask.to(self.compute_dtype), persistent=False)
+
+        self.relaxation_slope: Tensor
+        self.relaxation_intercept: Tensor
+        self.register_buffer("relaxation_slope", slope.to(self.compute_dtype), persistent=False)
+        self.register_buffer("relaxation_intercept", intercept, persistent=False)
 
     @override
-    def set_C_and_reset_parameters(self, C: Tensor) -> None:
+    def set_C_and_reset_parameters(self, C: CompactC) -> None:
         super().set_C_and_reset_parameters(C)
-        self.pi: nn.Parameter = nn.Parameter(torch.rand((self.num_batches, self.P.size(0))).to(C))
+        self.pi: nn.Parameter = nn.Parameter(
+            torch.rand((self.num_batches, self.P.size(0))).to(self.P)
+        )
         self.alpha: nn.Parameter = nn.Parameter(
-            torch.rand((self.num_batches, self.num_unstable)).to(C)
+            torch.rand((self.num_batches, self.num_relaxed)).to(self.P)
+        )
+
+    @override
+    def set_C(self, C: CompactC) -> None:
+        super().set_C(C)
+
+        # Preallocated `V`, that's reused between epochs.
+        self.V_workspace: Tensor
+        self.register_buffer(
+            "V_workspace",
+            torch.zeros((self.num_batches, self.num_neurons), dtype=self.compute_dtype).to(
+                self.L.device
+            ),
+            persistent=False,
         )
 
     def forward(self, V_next: Tensor, accum_sum: Tensor) -> Tuple[Tensor, Tensor]:
+        return self.forward_from_product(self.transposed_layer_next.forward(V_next), accum_sum)
+
+    def forward_from_product(
+        self, V_next_W_next: Tensor, accum_sum: Tensor
+    ) -> Tuple[Tensor, Tensor]:
+        """Same as `forward`, but from `V_next_W_next = transposed_layer_next.forward(V_next)`
+        (eg. as computed for many instances at once, by `MultiInstanceSolver`).
+        """
         # Assign to local variables, so that they can be used w/o `self.` prefix.
-        bias_module, transposed_layer_next, num_batches, num_neurons, num_unstable, P, P_hat, p, C, stably_act_mask, stably_deact_mask, unstable_mask, pi, alpha, U, L = self.bias_module, self.transposed_layer_next, self.num_batches, self.num_neurons, self.num_unstable, self.P, self.P_hat, self.p, self.C, self.stably_act_mask, self.stably_deact_mask, self.unstable_mask, self.pi, self.alpha, self.U, self.L  # fmt: skip
-        device = V_next.device
+        bias_module, num_relaxed, num_stably_act, unstable_start, P, P_hat, p, pi, alpha, relaxation_slope, relaxation_intercept = self.bias_module, self.num_relaxed, self.num_stably_act, self.unstable_start, self.P, self.P_hat, self.p, self.pi, self.alpha, self.relaxation_slope, self.relaxation_intercept  # fmt: skip
 
-        V: Tensor = torch.zeros((num_batches, num_neurons)).to(device)
-        V_next_W_next = transposed_layer_next.forward(V_next)
+        # Write into the preallocated workspace instead of allocating a new `V`.
+        # It's detached, as the previous epoch's graph has already been freed.
+        # `C` is only subtracted at the end, after all the masked assignments.
+        V: Tensor = self.V_workspace.detach()
 
         # Stably activated.
-        stably_activated_V: Tensor = V_next_W_next - C
-        V[:, stably_act_mask] = stably_activated_V[:, stably_act_mask]
+        V[:, :num_stably_act] = V_next_W_next[:, :num_stably_act]
+
+        # Stably deactivated are all zeros (excluding `C`), and are never written to.
 
-        # Stably deactivated.
-        V[:, stably_deact_mask] = -C[:, stably_deact_mask]
+        # Relaxed (ie. unstable).
+        if num_relaxed == 0:
+            V = self.subtract_C(V)
+            return V, accum_sum - bias_module.forward(V)
 
-        # Unstable.
-        if num_unstable == 0:
-            return V, accum_sum
+        if self.has_stable_relaxed:
+            alpha = torch.where(self.alpha_is_fixed, self.fixed_alpha, alpha)
 
-        V_hat = V_next_W_next[:, unstable_mask] - pi @ P_hat
+        V_hat = V_next_W_next[:, unstable_start:] - pi @ P_hat
+        V_hat_plus = bracket_plus(V_hat)
 
-        V[:, unstable_mask] = (
-            (bracket_plus(V_hat) * U[unstable_mask]) / (U[unstable_mask] - L[unstable_mask])
-            - C[:, unstable_mask]
-            - alpha * bracket_minus(V_hat)
-            - pi @ P
+        V[:, unstable_start:] = (
+            V_hat_plus * relaxation_slope - alpha * bracket_minus(V_hat) - pi @ P
         )
+        V = self.subtract_C(V)
 
         return V, accum_sum + (
-            -(bias_module.forward(V))
-            + torch.sum(
-                (bracket_plus(V_hat) * U[unstable_mask] * L[unstable_mask])
-                / (U[unstable_mask] - L[unstable_mask]),
-                dim=1,
-            )
-            - pi @ p
+            -(bias_module.forward(V)) + V_hat_plus.to(p) @ relaxation_intercept - pi.to(p) @ p
         )
 
     @override
     def clamp_parameters(self) -> None:
         self.pi.clamp_(min=0)
         self.alpha.clamp_(min=0, max=1)
+
+
+def _get_leading_run_length(mask: Tensor) -> int:
+    """Returns the number of leading `True`s of the 1D `mask`."""
+    return int(torch.cumprod(mask.int(), dim=0).sum().item())
@@ -5,6 +5,7 @@ from torch import Tensor, nn
 from typing_extensions import override
 
 from ...preprocessing.class_definitions import Bias
+from ...preprocessing.preprocessing_utils import CompactC
 from ...preprocessing.transpose import UnaryForward
 from .base_class import SolverLayer
 
@@ -23,7 +24,7 @@ class OutputLayer(SolverLayer):
         stably_act_mask: Tensor,
         stably_deact_mask: Tensor,
         unstable_mask: Tensor,
-        C: Tensor,
+        C: CompactC,
         transposed_layer: UnaryForward,
         bias_module: Bias,
         H: Tensor,
@@ -39,10 +40,16 @@ class OutputLayer(SolverLayer):
         self.register_buffer("d", d)
 
     @override
-    def set_C_and_reset_parameters(self, C: Tensor) -> None:
+    def set_compute_dtype(self, dtype: torch.dtype) -> None:
+        super().set_compute_dtype(dtype)
+        self.H = self.H.to(dtype)
+        self.d = self.d.to(self.accum_dtype)
+
+    @override
+    def set_C_and_reset_parameters(self, C: CompactC) -> None:
         super().set_C_and_reset_parameters(C)
         self.gamma: nn.Parameter = nn.Parameter(
-            torch.rand((self.num_batches, self.H.size(0))).to(C)
+            torch.rand((self.num_batches, self.H.size(0))).to(self.H)
         )
 
     def forward(self) -> Tuple[Tensor, Tensor]:
@@ -51,7 +58,7 @@ class OutputLayer(SolverLayer):
 
         V = (-H.T @ gamma.T).T
         assert V.dim() == 2
-        return V, gamma @ d - bias_module.forward(V)
+        return V, gamma.to(d) @ d - bias_module.forward(V)
 
     @override
     def clamp_parameters(self) -> None:
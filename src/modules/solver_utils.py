@@ -12,3 +12,15 @@ def bracket_minus(X: Tensor) -> Tensor:
     value.
     """
     return -torch.clamp(X, max=0)
+
+
+def to_float32_rounded(X: Tensor, round_up: bool) -> Tensor:
+    """Converts `X` to float32, rounding towards +inf if `round_up` else
+    towards -inf, such that bounds stay sound after the conversion.
+    """
+    output = X.float()
+    if X.dtype == torch.float:
+        return output
+    direction = torch.tensor(torch.inf if round_up else -torch.inf).to(output)
+    is_rounded_wrongly = output.to(X) < X if round_up else output.to(X) > X
+    return torch.where(is_rounded_wrongly, torch.nextafter(output, direction), output)
@@ -0,0 +1,177 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple, Union
+
+import torch
+import torch.multiprocessing as torch_mp
+from torch import Tensor, nn
+
+from .modules.Solver import Solver
+from .preprocessing.solver_inputs import SolverInputs
+from .training.TrainingCallback import TrainingCallback
+from .training.TrainingConfig import TrainingConfig
+from .utils import seed_everything
+
+# Per-worker-process state, set by `_init_worker`.
+_worker_solver: Optional[Solver] = None
+_worker_config: Optional[TrainingConfig] = None
+_worker_callback: Optional[TrainingCallback] = None
+_worker_seed: Optional[int] = None
+
+
+class _Cancelled(Exception):
+    """Raised in a worker to abort its layer solve, after the problem was
+    falsified by another worker."""
+
+
+class _CancellationCallback(TrainingCallback):
+    """Aborts training once `cancel_event` is set."""
+
+    def __init__(self, cancel_event) -> None:
+        self.cancel_event = cancel_event
+
+    def on_epoch(self, epoch: int, loss: float, lrs: Dict[str, float]) -> None:
+        if self.cancel_event.is_set():
+            raise _Cancelled()
+
+
+def solve_layers_in_parallel(
+    inputs: SolverInputs,
+    training_config: TrainingConfig,
+    callback: TrainingCallback = TrainingCallback(),
+) -> Optional[Tuple[List[Tensor], List[Tensor]]]:
+    """Solves for each layer (except the last) in a pool of
+    `training_config.num_workers` CPU worker processes, returning the new
+    bounds in layer order, or `None` if the problem was falsified.
+
+    The layers are solved independently, from the same initial bounds (thus
+    it can't be used with `propagate_bounds`). The model weights and input
+    tensors are shared with the workers (see `_get_worker_inputs`), so that
+    they don't each receive a pickled copy of them. Once any worker falsifies
+    the problem, the pending layers are cancelled and the running ones are aborted.
+
+    Each layer is solved with the seed `base_seed + layer_index`, whr
+    `base_seed` is drawn from the caller's RNG (eg. as seeded by
+    `seed_everything`), so the results don't depend on which worker solves
+    which layer.
+
+    Only `on_layer_start`/`on_layer_end` are emitted to `callback`, with all
+    layers being started at once. The training events of the workers aren't
+    forwarded.
+    """
+    assert not training_config.propagate_bounds, "Parallel solving can't propagate bounds."
+    num_workers = training_config.num_workers
+    num_layers = len(inputs.L_list) - 1  # Don't solve for last layer
+    worker_inputs = _get_worker_inputs(inputs)
+    base_seed = int(torch.randint(0, 2**31 - 1, ()).item())
+
+    context = torch_mp.get_context("spawn")
+    cancel_event = context.Event()
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    new_bounds_list: Dict[int, Tuple[Tensor, Tensor]] = {}
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(worker_inputs, training_config, cancel_event, num_threads, base_seed),
+    ) as executor:
+        futures: Dict[Future, int] = {}
+        for layer_index in range(num_layers):
+            callback.on_layer_start(layer_index, _get_num_neurons_to_solve(inputs, layer_index))
+            futures[executor.submit(_solve_layer_in_worker, layer_index)] = layer_index
+
+        pending = set(futures)
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                layer_index = futures[future]
+                new_bounds, duration, is_cancelled = future.result()
+                if is_cancelled:
+                    continue
+                callback.on_layer_end(layer_index, duration, new_bounds is None)
+                if new_bounds is None:
+                    cancel_event.set()
+                    for x in pending:
+                        x.cancel()
+                    return None
+                new_bounds_list[layer_index] = new_bounds
+
+    new_L_list = [new_bounds_list[i][0] for i in range(num_layers)]
+    new_U_list = [new_bounds_list[i][1] for i in range(num_layers)]
+    return new_L_list, new_U_list
+
+
+def _get_num_neurons_to_solve(inputs: SolverInputs, layer_index: int) -> int:
+    """Same as `Solver.get_num_neurons_to_solve`, but w/o building the solver."""
+    L, U = inputs.L_list[layer_index], inputs.U_list[layer_index]
+    if layer_index == 0:
+        return L.numel()
+    return int(((L < 0) & (U > 0)).sum().item())
+
+
+def _get_worker_inputs(inputs: SolverInputs) -> Union[SolverInputs, Tuple[nn.Module, str]]:
+    """Returns `inputs` to send to the workers, with the model weights and the
+    input tensors in shared memory.
+
+    Memory-mapped inputs (see `SolverInputs.load_flat_file`) are returned as
+    `(model, flat_file_path)` instead, for each worker to map the file itself,
+    as pickling the mapped tensors would copy them into shared memory.
+
+    The tensors that aren't in shared memory yet are moved there in place (ie.
+    `inputs` then uses the shared memory too), rather than copied. Moving a
+    tensor copies its data though, so the parent briefly keeps an extra copy
+    of each tensor while it's being moved.
+    """
+    inputs.model.share_memory()
+    if inputs.flat_file_path is not None:
+        return inputs.model, inputs.flat_file_path
+
+    for tensor in [
+        *inputs.L_list,
+        *inputs.U_list,
+        *inputs.P_list,
+        *inputs.P_hat_list,
+        *inputs.p_list,
+        inputs.H,
+        inputs.d,
+    ]:
+        if not tensor.is_shared():
+            tensor.share_memory_()
+    return inputs
+
+
+def _init_worker(
+    inputs: Union[SolverInputs, Tuple[nn.Module, str]],
+    training_config: TrainingConfig,
+    cancel_event,
+    num_threads: int,
+    base_seed: int,
+) -> None:
+    global _worker_solver, _worker_config, _worker_callback, _worker_seed
+    torch.set_num_threads(num_threads)
+    _worker_seed = base_seed
+    if isinstance(inputs, tuple):
+        inputs = SolverInputs.load_flat_file(*inputs)
+    _worker_solver = Solver(inputs, getattr(torch, training_config.dtype))
+    _worker_config = training_config
+    _worker_callback = _CancellationCallback(cancel_event)
+
+
+def _solve_layer_in_worker(
+    layer_index: int,
+) -> Tuple[Optional[Tuple[Tensor, Tensor]], float, bool]:
+    """Returns `(new_bounds, duration, is_cancelled)`, whr `new_bounds` is
+    `None` if the problem was falsified."""
+    # Imported here, as `solve` imports this module.
+    from .solve import solve_layer
+
+    assert _worker_solver is not None and _worker_config is not None
+    assert _worker_callback is not None and _worker_seed is not None
+    seed_everything(_worker_seed + layer_index)
+    start_time = time.perf_counter()
+    try:
+        new_bounds = solve_layer(_worker_solver, layer_index, _worker_config, _worker_callback)
+    except _Cancelled:
+        return None, time.perf_counter() - start_time, True
+    return new_bounds, time.perf_counter() - start_time, False
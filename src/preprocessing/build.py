@@ -1,32 +1,84 @@
 from collections.abc import Iterator
-from typing import Iterator, List, Tuple, TypeVar, Union
+from typing import Iterator, List, NamedTuple, Optional, Tuple, TypeVar, Union
 
-import pytest
 from torch import Tensor, nn
 
 from ..modules.solver_layers.base_class import SolverLayer
 from ..modules.solver_layers.input_layer import InputLayer
 from ..modules.solver_layers.intermediate_layer import IntermediateLayer
 from ..modules.solver_layers.output_layer import OutputLayer
-from . import preprocessing_utils
+from . import preprocessing_utils, reorder_neurons
+from .class_definitions import Bias, UnaryForward
 from .solver_inputs import SolverInputs
 from .transpose import transpose_layer
 
 
-def build(inputs: SolverInputs) -> List[SolverLayer]:
+class ModelLayers(NamedTuple):
+    """The transposed (and reordered) affine layers of the model, and their
+    `Bias` modules, of the solver layers `[1:]` (see `get_model_layers`).
+
+    They only depend on the model and the neuron orders, so they can be shared
+    by the solver layers of multiple instances with the same model and neuron
+    orders (see `MultiInstanceSolver`), instead of transposing the model again.
+    """
+
+    transposed_layers: List[UnaryForward]
+    """Transposed layer of each solver layer, whr transposed layer `i` maps
+    layer `i + 1`'s neurons to layer `i`'s neurons."""
+    bias_modules: List[Bias]
+    """`Bias` module of each solver layer, whr `bias_modules[i]` is layer `i + 1`'s."""
+
+
+def get_model_layers(solver_layers: List[SolverLayer]) -> ModelLayers:
+    """Returns the `ModelLayers` of the solver layers built by `build()`."""
+    return ModelLayers(
+        transposed_layers=[x.transposed_layer for x in solver_layers[1:]],  # type: ignore
+        bias_modules=[x.bias_module for x in solver_layers[1:]],  # type: ignore
+    )
+
+
+def build(
+    inputs: SolverInputs,
+    neuron_orders: Optional[List[Optional[Tensor]]] = None,
+    model_layers: Optional[ModelLayers] = None,
+) -> List[SolverLayer]:
+    """Builds the solver layers of `inputs`.
+
+    Args:
+        inputs (SolverInputs): Inputs to solve for.
+        neuron_orders (Optional[List[Optional[Tensor]]], optional): Order of each \
+            layer's neurons (eg. shared by multiple instances, see \
+            `reorder_neurons.get_shared_neuron_orders`). Defaults to None (ie. \
+            ordered by `inputs`' own masks, see `reorder_neurons.get_neuron_orders`).
+        model_layers (Optional[ModelLayers], optional): Transposed layers and `Bias` \
+            modules to use instead of transposing the model's layers (eg. as built \
+            for another instance with the same model and `neuron_orders`). \
+            Defaults to None.
+    """
     preprocessing_utils.freeze_model(inputs.model)
+    assert model_layers is None or neuron_orders is not None
+
+    if neuron_orders is None:
+        # Reorder the intermediate layers' neurons, such that the stably-activated,
+        # stably-deactivated and unstable neurons are each in a contiguous range.
+        neuron_orders = reorder_neurons.get_neuron_orders(
+            *preprocessing_utils.get_masks(inputs.L_list, inputs.U_list)
+        )
+    L_list = [reorder_neurons.apply_order(L, x) for L, x in zip(inputs.L_list, neuron_orders)]
+    U_list = [reorder_neurons.apply_order(U, x) for U, x in zip(inputs.U_list, neuron_orders)]
     (
         stably_act_masks,
         stably_deact_masks,
         unstable_masks,
-    ) = preprocessing_utils.get_masks(inputs.L_list, inputs.U_list)
+    ) = preprocessing_utils.get_masks(L_list, U_list)
 
-    # Initially set to solve for input layer.
-    C_list, solve_coords = preprocessing_utils.get_C_for_layer(0, unstable_masks)
+    # Initially set to solve for an empty batch, as the actual batch to
+    # solve for is only set via `SolverSequential.solve_for_layer`.
+    C_list = [preprocessing_utils.CompactC(num_batches=0) for _ in unstable_masks]
 
     layer_gen = get_reversed_iterator(inputs.model.children())
-    L_gen = get_reversed_iterator(inputs.L_list)
-    U_gen = get_reversed_iterator(inputs.U_list)
+    L_gen = get_reversed_iterator(L_list)
+    U_gen = get_reversed_iterator(U_list)
     P_gen = get_reversed_iterator(inputs.P_list)
     P_hat_gen = get_reversed_iterator(inputs.P_hat_list)
     p_gen = get_reversed_iterator(inputs.p_list)
@@ -34,10 +86,29 @@ def build(inputs: SolverInputs) -> List[SolverLayer]:
     stably_deact_mask_gen = get_reversed_iterator(stably_deact_masks)
     unstable_mask_gen = get_reversed_iterator(unstable_masks)
     C_gen = get_reversed_iterator(C_list)
+    neuron_order_gen = get_reversed_iterator(neuron_orders)
+    # Transposed layer `i` maps layer `i`'s neurons to layer `i - 1`'s neurons.
+    transposed_order_gen = get_reversed_iterator(list(zip(neuron_orders[1:], neuron_orders[:-1])))
+    model_layer_gen: Optional[Iterator[Tuple[UnaryForward, Bias]]] = (
+        get_reversed_iterator(list(zip(*model_layers))) if model_layers is not None else None
+    )
 
     last_layer = next(layer_gen)
     assert isinstance(last_layer, nn.Linear)
-    transposed_layer, bias_module, out_feat = transpose_layer(last_layer, last_layer.out_features)
+    assert next(neuron_order_gen) is None  # Output layer isn't reordered.
+    transposed_order = next(transposed_order_gen)
+    if model_layer_gen is not None:
+        # The shared layers are already transposed, so the output features of
+        # the transposed layers (only used to transpose the next one) are unused.
+        transposed_layer, bias_module = next(model_layer_gen)
+        out_feat = last_layer.in_features
+    else:
+        transposed_layer, bias_module, out_feat = transpose_layer(
+            last_layer, last_layer.out_features
+        )
+        transposed_layer = reorder_neurons.reorder_transposed_layer(
+            transposed_layer, *transposed_order
+        )
 
     output_layer = OutputLayer(
         L=next(L_gen),
@@ -69,6 +140,9 @@ def build(inputs: SolverInputs) -> List[SolverLayer]:
                 stably_deact_mask_gen=stably_deact_mask_gen,
                 unstable_mask_gen=unstable_mask_gen,
                 C_gen=C_gen,
+                neuron_order_gen=neuron_order_gen,
+                transposed_order_gen=transposed_order_gen,
+                model_layer_gen=model_layer_gen,
                 prev_layer=prev_layer,
                 prev_out_feat=prev_out_feat,
             )
@@ -76,6 +150,7 @@ def build(inputs: SolverInputs) -> List[SolverLayer]:
         except StopIteration:
             break
 
+    assert next(neuron_order_gen) is None  # Input layer isn't reordered.
     solver_layers.append(
         InputLayer(
             L=next(L_gen),
@@ -89,9 +164,10 @@ def build(inputs: SolverInputs) -> List[SolverLayer]:
     )
 
     # Assert that all generators are depleted.
-    for gen in [layer_gen, L_gen, U_gen, P_gen, P_hat_gen, p_gen, stably_act_mask_gen, stably_deact_mask_gen, unstable_mask_gen, C_gen]:  # fmt: skip
-        with pytest.raises(StopIteration):
-            next(gen)
+    for gen in [layer_gen, L_gen, U_gen, P_gen, P_hat_gen, p_gen, stably_act_mask_gen, stably_deact_mask_gen, unstable_mask_gen, C_gen, neuron_order_gen, transposed_order_gen]:  # fmt: skip
+        assert next(gen, _DEPLETED) is _DEPLETED
+    if model_layer_gen is not None:
+        assert next(model_layer_gen, _DEPLETED) is _DEPLETED
 
     solver_layers.reverse()
     return solver_layers
@@ -99,6 +175,10 @@ def build(inputs: SolverInputs) -> List[SolverLayer]:
 
 T = TypeVar("T")
 
+_DEPLETED = object()
+"""Sentinel returned by `next(gen, _DEPLETED)` for depleted generators, as some
+generators yield `None`."""
+
 
 def get_reversed_iterator(list_or_iterator: Union[List[T], Iterator[T]]) -> Iterator[T]:
     items = list(list_or_iterator)
@@ -116,7 +196,10 @@ def build_intermediate_layer(
     stably_act_mask_gen: Iterator[Tensor],
     stably_deact_mask_gen: Iterator[Tensor],
     unstable_mask_gen: Iterator[Tensor],
-    C_gen: Iterator[Tensor],
+    C_gen: Iterator[preprocessing_utils.CompactC],
+    neuron_order_gen: Iterator[Optional[Tensor]],
+    transposed_order_gen: Iterator[Tuple[Optional[Tensor], Optional[Tensor]]],
+    model_layer_gen: Optional[Iterator[Tuple[UnaryForward, Bias]]],
     prev_layer: Union[IntermediateLayer, OutputLayer],
     prev_out_feat: int,
 ) -> Tuple[IntermediateLayer, int]:
@@ -124,7 +207,17 @@ def build_intermediate_layer(
     while not isinstance(layer, (nn.Linear, nn.Conv2d)):
         layer = next(layer_gen)
 
-    transposed_layer, bias_module, out_feat = transpose_layer(layer, prev_out_feat)
+    neuron_order = next(neuron_order_gen)
+    transposed_order = next(transposed_order_gen)
+    if model_layer_gen is not None:
+        transposed_layer, bias_module = next(model_layer_gen)
+        out_feat = prev_out_feat  # Unused, as the shared layers are already transposed.
+    else:
+        transposed_layer, bias_module, out_feat = transpose_layer(layer, prev_out_feat)
+        transposed_layer = reorder_neurons.reorder_transposed_layer(
+            transposed_layer, *transposed_order
+        )
+        bias_module = reorder_neurons.reorder_bias(bias_module, neuron_order)
     return (
         IntermediateLayer(
             L=next(L_gen),
@@ -139,6 +232,7 @@ def build_intermediate_layer(
             P=next(P_gen),
             P_hat=next(P_hat_gen),
             p=next(p_gen),
+            neuron_order=neuron_order,
         ),
         out_feat,
     )
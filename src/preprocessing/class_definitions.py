@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Protocol, Tuple
+from typing import Optional, Protocol, Tuple
 
+import torch
 from torch import Tensor, nn
 from typing_extensions import override
 
@@ -58,7 +59,11 @@ class ConvTranspose2dFlattenNoBias(nn.Module):
 
 
 class Bias(nn.Module, ABC, UnaryForward):
-    """Base class for generalising the `V_i^T . b` operation in the objective function."""
+    """Base class for generalising the `V_i^T . b` operation in the objective function.
+
+    The operation is accumulated in the bias' dtype (ie. the solver's `accum_dtype`),
+    irregardless of `V`'s dtype.
+    """
 
     def __init__(self, bias: Tensor, is_batched: bool = True) -> None:
         super().__init__()
@@ -82,7 +87,7 @@ class LinearBias(Bias):
         Returns:
             Tensor: Tensor of shape `(1,)` or `(num_batches, 1)`, with the bias applied.
         """
-        return V @ self.bias
+        return V.to(self.bias) @ self.bias
 
 
 class Conv2dBias(Bias):
@@ -96,7 +101,7 @@ class Conv2dBias(Bias):
         Returns:
             Tensor: Tensor of shape `(1,)` or `(num_batches, 1)`, with the bias applied.
         """
-        return V.sum(dim=(-2, -1)) @ self.bias
+        return V.sum(dim=(-2, -1), dtype=self.bias.dtype) @ self.bias
 
 
 class Conv2dFlattenBias(Bias):
@@ -113,5 +118,54 @@ class Conv2dFlattenBias(Bias):
         num_channels = self.bias.size(0)
         if self.is_batched:
             num_batches = V.size(0)
-            return V.reshape(num_batches, num_channels, -1).sum(dim=(-1)) @ self.bias
-        return V.reshape(num_channels, -1).sum(dim=(-2, -1)) @ self.bias
+            V = V.reshape(num_batches, num_channels, -1)
+            return V.sum(dim=(-1), dtype=self.bias.dtype) @ self.bias
+        return V.reshape(num_channels, -1).sum(dim=(-2, -1), dtype=self.bias.dtype) @ self.bias
+
+
+class ReorderedUnaryForward(nn.Module):
+    """Module that wraps a `UnaryForward` module, such that its input and
+    output neurons are reordered. Used for layers whose weights can't be
+    reordered directly (eg. transposed CNNs).
+    """
+
+    def __init__(
+        self,
+        module: nn.Module,
+        in_order: Optional[Tensor] = None,
+        out_order: Optional[Tensor] = None,
+    ) -> None:
+        """
+        Args:
+            module (nn.Module): `UnaryForward` module to wrap.
+            in_order (Optional[Tensor], optional): Shape `(N,)`. Order of the input \
+                neurons, whr `input[:, i]` is the original input neuron `in_order[i]`. \
+                Defaults to None (ie. original order).
+            out_order (Optional[Tensor], optional): Shape `(M,)`. Order of the output \
+                neurons, whr `output[:, i]` is the original output neuron `out_order[i]`. \
+                Defaults to None (ie. original order).
+        """
+        super().__init__()
+        self.module = module
+        self.in_inverse_order: Optional[Tensor]
+        self.out_order: Optional[Tensor]
+        self.register_buffer(
+            "in_inverse_order", torch.argsort(in_order) if in_order is not None else None
+        )
+        self.register_buffer("out_order", out_order)
+
+    def forward(self, input: Tensor) -> Tensor:
+        """
+        Args:
+            input (Tensor): Shape `(num_batches, N)`.
+
+        Returns:
+            Tensor: Shape `(num_batches, M)`.
+        """
+        x = input
+        if self.in_inverse_order is not None:
+            x = x[:, self.in_inverse_order]
+        x = self.module.forward(x)
+        if self.out_order is not None:
+            x = x[:, self.out_order]
+        return x
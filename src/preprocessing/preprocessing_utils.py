@@ -1,9 +1,8 @@
 import itertools
-from typing import Iterator, List, Tuple, cast
+from typing import Iterator, List, NamedTuple, Optional, Tuple, cast
 
 import torch
 from torch import Tensor, fx, nn
-from typing_extensions import TypeAlias
 
 
 def freeze_model(model: nn.Module) -> None:
@@ -65,61 +64,49 @@ def get_masks(
     return stably_act_masks, stably_deact_masks, unstable_masks
 
 
-NeuronCoords: TypeAlias = Tuple[int, int]
-"""Coordinates for a neuron in the model, in the form `(layer_index, neuron_index)`."""
+class CompactC(NamedTuple):
+    """Compact (index-based) representation of a layer's `C` matrix of shape
+    `(num_batches, num_neurons)`, whr every row is either all zeros or a `±1` one-hot.
 
+    Only the layer being solved for has non-zero rows, so all the other
+    layers' `C` are represented by just their `num_batches`.
+    """
+
+    num_batches: int
+    """Number of batches (ie. rows) in `C`."""
+    neuron_indices: Optional[Tensor] = None
+    """Shape `(num_batches,)`. Index of each row's non-zero element.
+    `None` if `C` is all zeros."""
+    signs: Optional[Tensor] = None
+    """Shape `(num_batches,)`. Value (`1` or `-1`) of each row's non-zero element.
+    `None` if `C` is all zeros."""
+
+
+def get_C_for_layer(layer_index: int, num_layers: int, solve_indices: Tensor) -> List[CompactC]:
+    """Get the `C_list` (in its compact form) to solve for the neurons
+    `solve_indices` in layer `layer_index`, where `layer_index` can be any layer
+    except the last (as we don't solve for output layer).
 
-def get_C_for_layer(
-    layer_index: int, unstable_masks: List[Tensor]
-) -> Tuple[List[Tensor], List[NeuronCoords]]:
-    """Get the `C_list` to solve for the unstable neurons in layer `layer_index`,
-    where `layer_index` can be any layer except the last (as we don't solve for
-    output layer).
+    Each neuron is solved for in 2 consecutive batches, the first minimising
+    and the second maximising it. The tensors are created directly on
+    `solve_indices.device` without any per-neuron work.
 
-    If `layer_index == 0`, `C_list` will solve all inputs neurons (irregardless of
-    whether they're unstable).
+    Args:
+        layer_index (int): Index of the layer to solve for.
+        num_layers (int): Total number of layers.
+        solve_indices (Tensor): Shape `(num_neurons_to_solve,)`. Indices of the \
+            neurons in layer `layer_index` to solve for.
     """
-    device = unstable_masks[0].device
-    num_layers = len(unstable_masks)
     assert layer_index < num_layers - 1
+    assert solve_indices.dim() == 1
 
-    C_list: List[Tensor] = []
-    coords: List[NeuronCoords] = []
-
-    # For input layer, solve for all input neurons.
-    if layer_index == 0:
-        num_input_neurons = len(unstable_masks[0])
-        C_0 = torch.zeros((num_input_neurons * 2, num_input_neurons)).to(device)
-        batch_index: int = 0
-        for index in range(num_input_neurons):
-            C_0[batch_index][index] = 1  # Minimising
-            C_0[batch_index + 1][index] = -1  # Maximising
-            batch_index += 2
-            coords.append((0, index))
-
-        C_list.append(C_0)
-        for i in range(1, num_layers):
-            mask: Tensor = unstable_masks[i]
-            num_neurons: int = len(mask)
-            C_list.append(torch.zeros((num_input_neurons * 2, num_neurons)).to(device))
-        return C_list, coords
-
-    # Else, solve for only unstable neurons in the specified layer.
-    num_unstable_in_target_layer = int(unstable_masks[layer_index].sum().item())
-    for i in range(num_layers):
-        mask: Tensor = unstable_masks[i]
-        num_neurons: int = len(mask)
-        if i != layer_index:
-            C_list.append(torch.zeros((num_unstable_in_target_layer * 2, num_neurons)).to(device))
-            continue
-
-        unstable_indices: Tensor = torch.where(mask)[0]
-        C = torch.zeros((num_unstable_in_target_layer * 2, num_neurons)).to(device)
-        batch_index: int = 0
-        for index in unstable_indices:
-            C[batch_index][index] = 1  # Minimising
-            C[batch_index + 1][index] = -1  # Maximising
-            batch_index += 2
-            coords.append((i, int(index.item())))
-        C_list.append(C)
-    return C_list, coords
+    num_neurons_to_solve = solve_indices.size(0)
+    num_batches = num_neurons_to_solve * 2
+
+    neuron_indices = solve_indices.repeat_interleave(2)
+    signs = torch.ones((num_neurons_to_solve, 2), device=solve_indices.device)
+    signs[:, 1] = -1  # Minimising, then maximising
+
+    C_list: List[CompactC] = [CompactC(num_batches) for _ in range(num_layers)]
+    C_list[layer_index] = CompactC(num_batches, neuron_indices, signs.flatten())
+    return C_list
@@ -0,0 +1,145 @@
+from typing import List, Optional
+
+import torch
+from torch import Tensor, nn
+
+from .class_definitions import (
+    Bias,
+    Conv2dFlattenBias,
+    LinearBias,
+    ReorderedUnaryForward,
+    UnaryForward,
+)
+
+
+def get_neuron_orders(
+    stably_act_masks: List[Tensor],
+    stably_deact_masks: List[Tensor],
+    unstable_masks: List[Tensor],
+) -> List[Optional[Tensor]]:
+    """Get the neuron order for each layer, such that the stably-activated,
+    stably-deactivated and unstable neurons of the intermediate layers each
+    sit in 1 contiguous range (in that order).
+
+    The relative order of the neurons within each range is preserved, so the
+    unstable neurons remain in the same order as their columns in `P`/`P_hat`.
+
+    The input and output layers aren't reordered (ie. their order is `None`),
+    as the input layer's neurons are fed to the model for the adversarial
+    check, and the output layer's neurons are constrained by `H`.
+
+    Returns:
+        List[Optional[Tensor]]: The order of each layer, whr the neuron at \
+            index `i` of the reordered layer is the original neuron `order[i]`.
+    """
+    num_layers = len(unstable_masks)
+    orders: List[Optional[Tensor]] = [None] * num_layers
+    for i in range(1, num_layers - 1):
+        orders[i] = torch.cat(
+            [
+                torch.where(stably_act_masks[i])[0],
+                torch.where(stably_deact_masks[i])[0],
+                torch.where(unstable_masks[i])[0],
+            ]
+        )
+    return orders
+
+
+def get_shared_neuron_orders(
+    stably_act_masks_list: List[List[Tensor]],
+    stably_deact_masks_list: List[List[Tensor]],
+) -> List[Optional[Tensor]]:
+    """Get the neuron order for each layer shared by multiple instances (ie.
+    `SolverInputs` with the same model), whr the neurons that are
+    stably-activated in all the instances, the neurons that are
+    stably-deactivated in all the instances, and the rest (ie. unstable in any
+    instance) each sit in 1 contiguous range (in that order).
+
+    Like in `get_neuron_orders`, the relative order of the neurons within each
+    range is preserved, so each instance's unstable neurons remain in the same
+    order as their columns in its `P`/`P_hat`.
+
+    Args:
+        stably_act_masks_list (List[List[Tensor]]): Stably-activated masks of each \
+            layer (see `preprocessing_utils.get_masks`), of each instance.
+        stably_deact_masks_list (List[List[Tensor]]): Stably-deactivated masks of \
+            each layer, of each instance.
+    """
+    num_layers = len(stably_act_masks_list[0])
+    stably_act_masks = [
+        torch.stack([x[i] for x in stably_act_masks_list]).all(dim=0) for i in range(num_layers)
+    ]
+    stably_deact_masks = [
+        torch.stack([x[i] for x in stably_deact_masks_list]).all(dim=0) for i in range(num_layers)
+    ]
+    rest_masks = [~(x | y) for x, y in zip(stably_act_masks, stably_deact_masks)]
+    return get_neuron_orders(stably_act_masks, stably_deact_masks, rest_masks)
+
+
+def reorder_transposed_layer(
+    transposed_layer: UnaryForward,
+    in_order: Optional[Tensor],
+    out_order: Optional[Tensor],
+) -> UnaryForward:
+    """Reorders the input and output neurons of a transposed layer.
+
+    For transposed `Linear` layers, the rows/columns of the weight are
+    reordered directly. Other layers are wrapped in a `ReorderedUnaryForward`.
+
+    Args:
+        transposed_layer (UnaryForward): Transposed layer to reorder.
+        in_order (Optional[Tensor]): Order of the input neurons, or `None` to keep as is.
+        out_order (Optional[Tensor]): Order of the output neurons, or `None` to keep as is.
+    """
+    if in_order is None and out_order is None:
+        return transposed_layer
+
+    if isinstance(transposed_layer, nn.Linear):
+        weight = transposed_layer.weight
+        if out_order is not None:
+            weight = weight[out_order]
+        if in_order is not None:
+            weight = weight[:, in_order]
+        transposed_layer.weight = nn.Parameter(weight.clone().detach(), requires_grad=False)
+        return transposed_layer
+
+    assert isinstance(transposed_layer, nn.Module)
+    return ReorderedUnaryForward(transposed_layer, in_order, out_order)
+
+
+def reorder_bias(bias_module: Bias, order: Optional[Tensor]) -> Bias:
+    """Reorders the neurons of a `Bias` module.
+
+    As a per-channel CNN bias can't be reordered by neuron, it's first
+    expanded to a per-neuron `LinearBias`.
+
+    Args:
+        bias_module (Bias): `Bias` module to reorder.
+        order (Optional[Tensor]): Order of the neurons, or `None` to keep as is.
+    """
+    if order is None:
+        return bias_module
+
+    bias = bias_module.bias
+    if isinstance(bias_module, Conv2dFlattenBias):
+        num_channels = bias.size(0)
+        bias = bias.repeat_interleave(order.size(0) // num_channels)
+
+    assert isinstance(bias_module, (LinearBias, Conv2dFlattenBias))
+    return LinearBias(bias[order].clone().detach(), bias_module.is_batched)
+
+
+def apply_order(X: Tensor, order: Optional[Tensor]) -> Tensor:
+    """Reorders the neurons on the last dim of `X`, or returns `X` as is if `order` is `None`."""
+    return X if order is None else X[..., order]
+
+
+def undo_order(X: Tensor, order: Optional[Tensor]) -> Tensor:
+    """Restores the original order of the reordered neurons on the last dim of
+    `X`, or returns `X` as is if `order` is `None`.
+    """
+    if order is None:
+        return X
+    output = torch.empty_like(X)
+    output[..., order] = X
+    return output
@@ -1,16 +1,19 @@
+import copy
+import hashlib
 import math
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 
 import torch
 from numpy import ndarray
 from torch import Tensor, nn
 
+from ..inputs import flat_file
 from ..inputs.save_file_types import GurobiResults, SolverInputsSavedDict
 from ..preprocessing.hwc_to_chw import (
     flattened_hwc_to_chw,
     flattened_unstable_hwc_to_chw,
 )
-from ..utils import load_onnx_model
+from ..utils import load_onnx_model, update_hasher
 
 
 class SolverInputs:
@@ -32,6 +35,9 @@ class SolverInputs:
     ) -> None:
         self.model: nn.Module = model
         self.ground_truth_neuron_index: int = ground_truth_neuron_index
+        self.flat_file_path: Optional[str] = None
+        """Path of the flat file the tensors are memory-mapped from (see `load_flat_file`), \
+        such that other processes can map it themselves. The tensors must then be left as is."""
 
         # Convert to tensor, float dtype, and correct dimensionality if necessary.
         self.L_list: List[Tensor] = [
@@ -79,6 +85,76 @@ class SolverInputs:
         }
         torch.save(saved_dict, save_file_path)
 
+    def save_flat_file_except_model(self, save_file_path: str) -> None:
+        """Saves all the inputs except the model (in CHW format) to a flat,
+        versioned file, that's memory-mapped when loaded via `load_flat_file`.
+
+        Args:
+            save_file_path (str): Path to save the inputs to.
+        """
+        tensors: Dict[str, Tensor] = {"H": self.H, "d": self.d}
+        for name in ["L_list", "U_list", "P_list", "P_hat_list", "p_list"]:
+            for i, tensor in enumerate(getattr(self, name)):
+                tensors[f"{name}.{i}"] = tensor
+        metadata = {
+            "ground_truth_neuron_index": self.ground_truth_neuron_index,
+            "num_layers": len(self.L_list),
+        }
+        flat_file.write_flat_file(save_file_path, tensors, metadata)
+
+    @staticmethod
+    def load_flat_file(model: Union[str, nn.Module], flat_file_path: str) -> "SolverInputs":
+        """Load the inputs saved via `save_flat_file_except_model`, along with
+        the model.
+
+        The tensors are memory-mapped (copy-on-write) instead of being read
+        eagerly, so loading is near-instant, and processes loading the same file
+        share 1 physical copy of it. As the file is already in CHW format, no
+        conversion is done.
+
+        Args:
+            model (Union[str, nn.Module]): The model, or the path to its ONNX model save file.
+            flat_file_path (str): Path to the inputs saved via `save_flat_file_except_model`.
+        """
+        if isinstance(model, str):
+            model = load_onnx_model(model)
+        tensors, metadata = flat_file.read_flat_file(flat_file_path)
+        num_layers: int = metadata["num_layers"]
+        inputs = SolverInputs(
+            model=model,
+            ground_truth_neuron_index=metadata["ground_truth_neuron_index"],
+            L_list=[tensors[f"L_list.{i}"] for i in range(num_layers)],
+            U_list=[tensors[f"U_list.{i}"] for i in range(num_layers)],
+            H=tensors["H"],
+            d=tensors["d"],
+            P_list=[tensors[f"P_list.{i}"] for i in range(num_layers - 2)],
+            P_hat_list=[tensors[f"P_hat_list.{i}"] for i in range(num_layers - 2)],
+            p_list=[tensors[f"p_list.{i}"] for i in range(num_layers - 2)],
+            is_hwc=False,
+        )
+        inputs.flat_file_path = flat_file_path
+        return inputs
+
+    def get_fingerprint(self) -> str:
+        """Returns a SHA-256 hex-digest of the model's weights and all the other
+        inputs, such that identical problems have the same fingerprint.
+        """
+        hasher = hashlib.sha256()
+
+        def update(name: str, tensor: Tensor) -> None:
+            hasher.update(f"{name}:".encode())
+            update_hasher(hasher, tensor)
+
+        for name, tensor in self.model.state_dict().items():
+            update(f"model.{name}", tensor)
+        hasher.update(f"ground_truth_neuron_index:{self.ground_truth_neuron_index};".encode())
+        update("H", self.H)
+        update("d", self.d)
+        for name in ["L_list", "U_list", "P_list", "P_hat_list", "p_list"]:
+            for i, tensor in enumerate(getattr(self, name)):
+                update(f"{name}[{i}]", tensor)
+        return hasher.hexdigest()
+
     @staticmethod
     def load(onnx_model_path: str, other_inputs_path: str) -> "SolverInputs":
         """Load ONNX model and the other inputs (saved in `SolverInputsSavedDict` format)
@@ -93,6 +169,58 @@ class SolverInputs:
         loaded: SolverInputsSavedDict = torch.load(other_inputs_path)
         return SolverInputs(model=model, **loaded)
 
+    def with_tightened_bounds(
+        self,
+        layer_index: int,
+        new_L: Tensor,
+        new_U: Tensor,
+    ) -> "SolverInputs":
+        """Returns a copy of these inputs, with the bounds of layer `layer_index`
+        replaced by the tightened bounds `new_L` and `new_U`.
+
+        Unstable neurons that became stable are dropped from the `P`/`P_hat`
+        columns, along with the constraints (ie. rows of `P`/`P_hat`/`p`) that
+        involve them. Dropping constraints only loosens the problem, so the
+        bounds computed from the returned inputs remain sound.
+
+        Args:
+            layer_index (int): Index of the layer whose bounds were tightened.
+            new_L (Tensor): Tightened lower bounds of layer `layer_index`.
+            new_U (Tensor): Tightened upper bounds of layer `layer_index`.
+        """
+        old_L, old_U = self.L_list[layer_index], self.U_list[layer_index]
+        new_L = torch.max(old_L, new_L.to(old_L))
+        new_U = torch.min(old_U, new_U.to(old_U))
+
+        output = copy.copy(self)
+        output.flat_file_path = None  # The tightened bounds aren't in the flat file.
+        output.L_list = list(self.L_list)
+        output.U_list = list(self.U_list)
+        output.P_list = list(self.P_list)
+        output.P_hat_list = list(self.P_hat_list)
+        output.p_list = list(self.p_list)
+        output.L_list[layer_index] = new_L
+        output.U_list[layer_index] = new_U
+
+        # Only the intermediate layers have `P`/`P_hat`/`p`.
+        is_intermediate_layer = 0 < layer_index < len(self.L_list) - 1
+        if not is_intermediate_layer:
+            return output
+
+        old_unstable_mask = (old_L < 0) & (old_U > 0)
+        new_unstable_mask = (new_L < 0) & (new_U > 0)
+        still_unstable = new_unstable_mask[old_unstable_mask]  # Over the `P`/`P_hat` columns.
+
+        P = self.P_list[layer_index - 1]
+        P_hat = self.P_hat_list[layer_index - 1]
+        p = self.p_list[layer_index - 1]
+        stabilised = ~still_unstable
+        kept_rows = ~((P[:, stabilised] != 0).any(dim=1) | (P_hat[:, stabilised] != 0).any(dim=1))
+        output.P_list[layer_index - 1] = P[kept_rows][:, still_unstable]
+        output.P_hat_list[layer_index - 1] = P_hat[kept_rows][:, still_unstable]
+        output.p_list[layer_index - 1] = p[kept_rows]
+        return output
+
     def convert_gurobi_hwc_to_chw(
         self,
         gurobi_results: GurobiResults,
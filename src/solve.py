@@ -1,30 +1,47 @@
-from typing import List, Literal, Tuple, Union, overload
+import hashlib
+import time
+from typing import Dict, List, Literal, Optional, Tuple, Union, overload
 
 import torch
 from numpy import ndarray
 from torch import Tensor
 
+from .checkpoint import (
+    get_checkpoint_dual_parameters,
+    load_layer_checkpoints,
+    save_layer_checkpoint,
+)
+from .inputs.save_file_types import LayerCheckpointSavedDict
+from .modules.DualParameters import DualParameters
 from .modules.Solver import Solver
+from .modules.solver_utils import to_float32_rounded
+from .parallel_solve import solve_layers_in_parallel
 from .preprocessing.solver_inputs import SolverInputs
+from .ResultCache import ResultCache
 from .training.train import train
+from .training.TrainingCallback import TrainingCallback
 from .training.TrainingConfig import TrainingConfig
 
 
 # fmt: off
 @overload
-def solve(solver_inputs: SolverInputs, return_solver: Literal[False] = False, device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig()) -> Tuple[Literal[True], List[ndarray], List[ndarray]]: ...
+def solve(solver_inputs: SolverInputs, return_solver: Literal[False] = False, device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig(), callback: TrainingCallback = TrainingCallback(), initial_dual_parameters: Optional[Dict[int, DualParameters]] = None, checkpoint_dir: Optional[str] = None, cache: Optional[ResultCache] = None) -> Tuple[Literal[True], List[ndarray], List[ndarray]]: ...
 @overload
-def solve(solver_inputs: SolverInputs, return_solver: Literal[False] = False, device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig()) -> Tuple[Literal[False], None, None]: ...
+def solve(solver_inputs: SolverInputs, return_solver: Literal[False] = False, device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig(), callback: TrainingCallback = TrainingCallback(), initial_dual_parameters: Optional[Dict[int, DualParameters]] = None, checkpoint_dir: Optional[str] = None, cache: Optional[ResultCache] = None) -> Tuple[Literal[False], None, None]: ...
 @overload
-def solve(solver_inputs: SolverInputs, return_solver: Literal[True], device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig()) -> Tuple[Literal[True], List[ndarray], List[ndarray], Solver]: ...
+def solve(solver_inputs: SolverInputs, return_solver: Literal[True], device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig(), callback: TrainingCallback = TrainingCallback(), initial_dual_parameters: Optional[Dict[int, DualParameters]] = None, checkpoint_dir: Optional[str] = None, cache: Optional[ResultCache] = None) -> Tuple[Literal[True], List[ndarray], List[ndarray], Solver]: ...
 @overload
-def solve(solver_inputs: SolverInputs, return_solver: Literal[True], device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig()) -> Tuple[Literal[False], None, None, Solver]: ...
+def solve(solver_inputs: SolverInputs, return_solver: Literal[True], device: torch.device = torch.device('cpu'), training_config: TrainingConfig = TrainingConfig(), callback: TrainingCallback = TrainingCallback(), initial_dual_parameters: Optional[Dict[int, DualParameters]] = None, checkpoint_dir: Optional[str] = None, cache: Optional[ResultCache] = None) -> Tuple[Literal[False], None, None, Solver]: ...
 # fmt: on
 def solve(
     solver_inputs: SolverInputs,
     return_solver: bool = False,
     device: torch.device = torch.device("cpu"),
     training_config: TrainingConfig = TrainingConfig(),
+    callback: TrainingCallback = TrainingCallback(),
+    initial_dual_parameters: Optional[Dict[int, DualParameters]] = None,
+    checkpoint_dir: Optional[str] = None,
+    cache: Optional[ResultCache] = None,
 ) -> Union[
     Tuple[bool, Union[List[ndarray], None], Union[List[ndarray], None]],
     Tuple[bool, Union[List[ndarray], None], Union[List[ndarray], None], Solver],
@@ -37,35 +54,200 @@ def solve(
         device (torch.device, optional): Device to compute on. Defaults to torch.device("cpu").
         training_config (TrainingConfig, optional): Configuration to use during training. \
             Defaults to TrainingConfig().
+        callback (TrainingCallback, optional): Callback to emit the solving/training \
+            events to. Use `CallbackList` for multiple callbacks. Defaults to \
+            TrainingCallback() (ie. no-op).
+        initial_dual_parameters (Optional[Dict[int, DualParameters]], optional): Dual \
+            parameters of each layer to warm-start its solve with, matched by neuron \
+            coordinates (eg. `Solver.dual_parameters` of a related problem's solve, \
+            with `keep_dual_parameters=True`). Defaults to None (ie. random initialisation).
+        checkpoint_dir (Optional[str], optional): Dir to atomically save each solved \
+            layer's bounds (and dual parameters, if `keep_dual_parameters=True`) to. \
+            Restarting with the same inputs skips the layers already saved there. \
+            Defaults to None (ie. no checkpointing).
+        cache (Optional[ResultCache], optional): Cache to return the results from \
+            without solving, if the same inputs were solved with the same result-affecting \
+            configs before, else to store the results in. Bypassed if `return_solver=True`. \
+            Defaults to None (ie. no caching).
 
     Returns:
         `(is_falsified, new_lower_bounds, new_upper_bounds)` and optionally, the `Solver` instance \
             as the last element if `return_solver == True`.
     """
-    solver = Solver(solver_inputs).to(device)
+    cache_key: Optional[str] = None
+    if cache is not None and not return_solver:
+        cache_key = ResultCache.get_key(solver_inputs, training_config, initial_dual_parameters)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+    is_parallel = training_config.num_workers > 1
+    solver: Optional[Solver] = None
+    # The parallel solving builds its own solvers in the workers, so the
+    # solver here is only built if it's to be returned.
+    if not is_parallel or return_solver:
+        solver = Solver(solver_inputs, getattr(torch, training_config.dtype)).to(device)
+        if initial_dual_parameters is not None:
+            solver.initial_dual_parameters = initial_dual_parameters
 
     new_L_list: List[Tensor] = []
     new_U_list: List[Tensor] = []
-    for layer_index in range(len(solver.sequential) - 1):  # Don't solve for last layer
-        solver.reset_and_solve_for_layer(layer_index)
-        is_falsified = train(solver, training_config)
-        if is_falsified:
+    if is_parallel:
+        assert device.type == "cpu", "Parallel solving is only supported on CPU."
+        assert (
+            initial_dual_parameters is None and not training_config.keep_dual_parameters
+        ), "Parallel solving doesn't support warm-starting/keeping the dual parameters."
+        assert checkpoint_dir is None, "Parallel solving doesn't support checkpointing."
+        new_bounds_lists = solve_layers_in_parallel(solver_inputs, training_config, callback)
+        if new_bounds_lists is None:
+            if cache is not None and cache_key is not None:
+                cache.put(cache_key, (True, None, None))
             return (True, None, None, solver) if return_solver else (True, None, None)
+        new_L_list = [to_float32_rounded(x, round_up=False) for x in new_bounds_lists[0]]
+        new_U_list = [to_float32_rounded(x, round_up=True) for x in new_bounds_lists[1]]
+    else:
+        assert solver is not None
+        fingerprint = ""
+        checkpoints: Dict[int, LayerCheckpointSavedDict] = {}
+        if checkpoint_dir is not None:
+            fingerprint = get_checkpoint_fingerprint(
+                solver_inputs, training_config, initial_dual_parameters
+            )
+            checkpoints = load_layer_checkpoints(checkpoint_dir, fingerprint)
 
-        new_L, new_U = solver.get_updated_bounds(layer_index)
-        new_L_list.append(new_L)
-        new_U_list.append(new_U)
+        for layer_index in range(len(solver.sequential) - 1):  # Don't solve for last layer
+            if layer_index in checkpoints:
+                new_bounds = load_checkpointed_layer(solver, checkpoints[layer_index])
+            else:
+                new_bounds = solve_layer(solver, layer_index, training_config, callback)
+                if checkpoint_dir is not None:
+                    save_layer_checkpoint(
+                        checkpoint_dir,
+                        fingerprint,
+                        layer_index,
+                        new_bounds,
+                        solver.dual_parameters.get(layer_index),
+                    )
+            if new_bounds is None:
+                if cache is not None and cache_key is not None:
+                    cache.put(cache_key, (True, None, None))
+                return (True, None, None, solver) if return_solver else (True, None, None)
+
+            new_L = to_float32_rounded(new_bounds[0], round_up=False)
+            new_U = to_float32_rounded(new_bounds[1], round_up=True)
+            if training_config.propagate_bounds:
+                solver.update_bounds(layer_index, new_L, new_U)
+            new_L_list.append(new_L)
+            new_U_list.append(new_U)
 
     # Add last initial bounds.
-    new_L_list.append(solver.sequential[-1].L)
-    new_U_list.append(solver.sequential[-1].U)
+    new_L_list.append(solver_inputs.L_list[-1])
+    new_U_list.append(solver_inputs.U_list[-1])
 
     # Convert tensors to numpy arrays.
     numpy_L_list: List[ndarray] = [x.cpu().numpy() for x in new_L_list]
     numpy_U_list: List[ndarray] = [x.cpu().numpy() for x in new_U_list]
+    if cache is not None and cache_key is not None:
+        cache.put(cache_key, (False, numpy_L_list, numpy_U_list))
 
     return (
         (False, numpy_L_list, numpy_U_list, solver)
         if return_solver
         else (False, numpy_L_list, numpy_U_list)
     )
+
+
+def get_checkpoint_fingerprint(
+    solver_inputs: SolverInputs,
+    training_config: TrainingConfig,
+    initial_dual_parameters: Optional[Dict[int, DualParameters]] = None,
+) -> str:
+    """Returns the fingerprint of the layer checkpoints of solving `solver_inputs`.
+
+    It's keyed like the cached results (see `ResultCache.get_key`), as the
+    checkpointed bounds are results too, but also on `keep_dual_parameters`,
+    as the checkpoints saved without it lack the layers' dual parameters.
+    """
+    cache_key = ResultCache.get_key(solver_inputs, training_config, initial_dual_parameters)
+    keep_dual_parameters = training_config.keep_dual_parameters
+    return hashlib.sha256(
+        f"{cache_key};keep_dual_parameters={keep_dual_parameters}".encode()
+    ).hexdigest()
+
+
+def load_checkpointed_layer(
+    solver: Solver, checkpoint: LayerCheckpointSavedDict
+) -> Optional[Tuple[Tensor, Tensor]]:
+    """Returns the `(new_lower_bounds, new_upper_bounds)` of a checkpointed
+    layer on the solver's device (or `None` if the problem was falsified), and
+    restores its dual parameters into `solver.dual_parameters`.
+    """
+    if checkpoint["is_falsified"]:
+        return None
+    dual_parameters = get_checkpoint_dual_parameters(checkpoint)
+    if dual_parameters is not None:
+        solver.dual_parameters[checkpoint["layer_index"]] = dual_parameters
+
+    new_L, new_U = checkpoint["L"], checkpoint["U"]
+    assert new_L is not None and new_U is not None
+    device = solver.sequential[0].L.device
+    return new_L.to(device), new_U.to(device)
+
+
+def solve_layer(
+    solver: Solver,
+    layer_index: int,
+    training_config: TrainingConfig = TrainingConfig(),
+    callback: TrainingCallback = TrainingCallback(),
+) -> Optional[Tuple[Tensor, Tensor]]:
+    """Solves for the neurons in layer `layer_index`, in batches of at most
+    `training_config.max_batch_size` rows.
+
+    Args:
+        solver (Solver): The `Solver` to solve with.
+        layer_index (int): Index of the layer to solve for.
+        training_config (TrainingConfig, optional): Configuration to use during training. \
+            Defaults to TrainingConfig().
+        callback (TrainingCallback, optional): Callback to emit the solving/training \
+            events to. Defaults to TrainingCallback() (ie. no-op).
+
+    Returns:
+        Optional[Tuple[Tensor, Tensor]]: `(new_lower_bounds, new_upper_bounds)` for the \
+            layer, or `None` if the problem was falsified.
+    """
+    num_neurons = solver.get_num_neurons_to_solve(layer_index)
+    max_batch_size = training_config.max_batch_size
+    assert max_batch_size is None or max_batch_size >= 2, "Expected `max_batch_size` to be >= 2."
+    num_neurons_per_batch = num_neurons if max_batch_size is None else max_batch_size // 2
+
+    callback.on_layer_start(layer_index, num_neurons)
+    start_time = time.perf_counter()
+
+    # Layer has no neurons to solve for, so its bounds remain unchanged.
+    if num_neurons == 0:
+        layer = solver.sequential[layer_index]
+        L, U = layer.restore_neuron_order(layer.L), layer.restore_neuron_order(layer.U)
+        callback.on_layer_end(layer_index, time.perf_counter() - start_time, False)
+        return L.clone().detach(), U.clone().detach()
+
+    new_L: Optional[Tensor] = None
+    new_U: Optional[Tensor] = None
+    dual_parameters_list: List[DualParameters] = []
+    for start in range(0, num_neurons, num_neurons_per_batch):
+        solver.reset_and_solve_for_layer(layer_index, start, start + num_neurons_per_batch)
+        is_falsified = train(solver, training_config, callback)
+        if is_falsified:
+            callback.on_layer_end(layer_index, time.perf_counter() - start_time, True)
+            return None
+        new_L, new_U = solver.get_updated_bounds(
+            layer_index, new_L, new_U, training_config.finalize_in_float64
+        )
+        if training_config.keep_dual_parameters:
+            dual_parameters_list.append(solver.get_dual_parameters())
+
+    if training_config.keep_dual_parameters:
+        solver.dual_parameters[layer_index] = DualParameters.cat(dual_parameters_list)
+
+    callback.on_layer_end(layer_index, time.perf_counter() - start_time, False)
+    assert new_L is not None and new_U is not None
+    return new_L, new_U
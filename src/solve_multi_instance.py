@@ -0,0 +1,123 @@
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import torch
+from numpy import ndarray
+from torch import Tensor
+
+from .modules.MultiInstanceSolver import MultiInstanceSolver
+from .modules.solver_utils import to_float32_rounded
+from .preprocessing.solver_inputs import SolverInputs
+from .training.train_multi_instance import train_multi_instance
+from .training.TrainingCallback import TrainingCallback
+from .training.TrainingConfig import TrainingConfig
+
+
+def solve_multi_instance(
+    inputs_list: List[SolverInputs],
+    device: torch.device = torch.device("cpu"),
+    training_config: TrainingConfig = TrainingConfig(),
+    callback: TrainingCallback = TrainingCallback(),
+) -> List[Tuple[bool, Optional[List[ndarray]], Optional[List[ndarray]]]]:
+    """Solves multiple instances (ie. `SolverInputs` that share the same model,
+    but differ in their bounds/`P`/`P_hat`/`p`/`H`/`d`) at once, with a
+    `MultiInstanceSolver`. Falsified instances are dropped as soon as they're found.
+
+    Each layer is solved in rounds of at most `training_config.max_batch_size`
+    rows per instance, whr each round trains the instances that still have
+    neurons left to solve for at once.
+
+    Args:
+        inputs_list (List[SolverInputs]): Inputs of each instance to solve for. \
+            All of them must have the same model (ie. the first instance's model is used).
+        device (torch.device, optional): Device to compute on. Defaults to torch.device("cpu").
+        training_config (TrainingConfig, optional): Configuration to use during training. \
+            `compile_solver`, `stop_per_batch`, `num_workers > 1` and \
+            `keep_dual_parameters` aren't supported. Defaults to TrainingConfig().
+        callback (TrainingCallback, optional): Callback to emit the solving/training \
+            events to, whr the layer events are for all the instances at once. \
+            Defaults to TrainingCallback() (ie. no-op).
+
+    Returns:
+        `(is_falsified, new_lower_bounds, new_upper_bounds)` of each instance, in \
+            the order of `inputs_list`.
+    """
+    max_batch_size = training_config.max_batch_size
+    assert max_batch_size is None or max_batch_size >= 2, "Expected `max_batch_size` to be >= 2."
+    assert training_config.num_workers == 1, "Parallel solving doesn't support multiple instances."
+    assert (
+        not training_config.keep_dual_parameters
+    ), "Keeping the dual parameters isn't supported with multiple instances."
+    solver = MultiInstanceSolver(inputs_list, getattr(torch, training_config.dtype)).to(device)
+
+    new_L_lists: Dict[int, List[Tensor]] = {i: [] for i in solver.active_instances}
+    new_U_lists: Dict[int, List[Tensor]] = {i: [] for i in solver.active_instances}
+    for layer_index in range(solver.num_layers - 1):  # Don't solve for last layer
+        num_neurons = {
+            i: solver.get_solver(i).get_num_neurons_to_solve(layer_index)
+            for i in solver.active_instances
+        }
+        callback.on_layer_start(layer_index, sum(num_neurons.values()))
+        start_time = time.perf_counter()
+
+        new_bounds: Dict[int, Tuple[Optional[Tensor], Optional[Tensor]]] = {
+            i: (None, None) for i in solver.active_instances
+        }
+        falsified_instances: Set[int] = set()
+        max_num_neurons = max(num_neurons.values())
+        num_neurons_per_batch = max_num_neurons if max_batch_size is None else max_batch_size // 2
+        # No rounds if no instance has neurons to solve for.
+        for start in range(0, max_num_neurons, max(num_neurons_per_batch, 1)):
+            # Only train the instances that have neurons left to solve for in this round.
+            instances = [i for i in solver.active_instances if start < num_neurons[i]]
+            if len(instances) == 0:  # The remaining ones were falsified in previous rounds.
+                break
+            for i in instances:
+                solver.get_solver(i).reset_and_solve_for_layer(
+                    layer_index, start, start + num_neurons_per_batch
+                )
+            other_instances = [i for i in solver.active_instances if i not in instances]
+            solver.drop_instances(other_instances)
+            falsified_instances |= train_multi_instance(solver, training_config, callback)
+            solver.restore_instances(other_instances)
+
+            for i in instances:
+                if i in falsified_instances:
+                    continue
+                new_bounds[i] = solver.get_solver(i).get_updated_bounds(
+                    layer_index, *new_bounds[i], training_config.finalize_in_float64
+                )
+
+        callback.on_layer_end(
+            layer_index, time.perf_counter() - start_time, len(falsified_instances) > 0
+        )
+        for i in falsified_instances:
+            del new_L_lists[i], new_U_lists[i]
+        if len(solver.active_instances) == 0:
+            break
+
+        for i in solver.active_instances:
+            new_L, new_U = new_bounds[i]
+            if new_L is None or new_U is None:
+                # Layer has no neurons to solve for, so its bounds remain unchanged.
+                layer = solver.get_solver(i).sequential[layer_index]
+                new_L = layer.restore_neuron_order(layer.L).clone().detach()
+                new_U = layer.restore_neuron_order(layer.U).clone().detach()
+            new_L = to_float32_rounded(new_L, round_up=False)
+            new_U = to_float32_rounded(new_U, round_up=True)
+            if training_config.propagate_bounds:
+                solver.get_solver(i).update_bounds(layer_index, new_L, new_U)
+            new_L_lists[i].append(new_L)
+            new_U_lists[i].append(new_U)
+
+    results: List[Tuple[bool, Optional[List[ndarray]], Optional[List[ndarray]]]] = [
+        (True, None, None) for _ in inputs_list
+    ]
+    for i in solver.active_instances:
+        # Add last initial bounds.
+        L_list = new_L_lists[i] + [inputs_list[i].L_list[-1]]
+        U_list = new_U_lists[i] + [inputs_list[i].U_list[-1]]
+
+        # Convert tensors to numpy arrays.
+        results[i] = (False, [x.cpu().numpy() for x in L_list], [x.cpu().numpy() for x in U_list])
+    return results
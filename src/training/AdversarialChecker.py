@@ -0,0 +1,198 @@
+import time
+from typing import List, Optional
+
+import torch
+import torch.nn.functional as F
+from torch import Tensor
+
+from ..modules.Solver import Solver
+
+
+class AdversarialChecker:
+    """Incrementally checks the concrete inputs generated from each epoch's
+    `theta` via the solver's adversarial-check model, in fixed-size chunks.
+
+    The concrete inputs are written into a preallocated buffer of `chunk_size`
+    rows, and each chunk is checked as soon as it's full. Thus the memory used
+    stays constant, and the checks are spread out across the epochs.
+
+    As the concrete inputs only depend on the sign pattern of `theta`'s rows,
+    the bit-packed patterns already added can be cached on-device, and repeated
+    patterns skipped, such that only new concrete inputs are checked. The cache
+    is kept on the solver (see `Solver.adv_check_seen_patterns`), so that it's
+    shared by the checkers of all the batches of a layer. As selecting the
+    unseen patterns syncs with the device, the patterns are only deduplicated
+    (and their concrete inputs checked) in `flush`.
+    """
+
+    def __init__(
+        self,
+        solver: Solver,
+        chunk_size: int,
+        defer_sync: bool = False,
+        cache_size: int = 0,
+    ) -> None:
+        """
+        Args:
+            solver (Solver): Solver whose thetas are checked.
+            chunk_size (int): Num. of concrete inputs to check at once.
+            defer_sync (bool, optional): Whether to keep the results of the \
+                checked chunks on-device until `flush`, instead of reading each \
+                chunk's result (ie. syncing with the device) immediately. Defaults to False.
+            cache_size (int, optional): Max. num. of sign patterns to cache, after \
+                which the oldest ones are evicted. If > 0, the concrete inputs are \
+                only checked in `flush`. Defaults to 0 (ie. no caching).
+        """
+        assert chunk_size >= 1, "Expected `chunk_size` to be >= 1."
+        self.solver = solver
+        self.adv_check_model = solver.adv_check_model
+        # In the model's dtype (ie. float32, like the inputs the bounds are from),
+        # irregardless of the solver's accumulation dtype.
+        self.L_0: Tensor = solver.sequential[0].L.detach().float()
+        self.U_0: Tensor = solver.sequential[0].U.detach().float()
+        self.defer_sync = defer_sync
+
+        self.chunk_size = chunk_size
+        self.buffer = torch.empty((chunk_size, self.L_0.size(0))).to(self.L_0)
+        self.num_buffered = 0
+
+        self.check_time: float = 0.0
+        """Time spent checking since the last `pop_check_time`."""
+        self._deferred_is_falsified: Optional[Tensor] = None
+
+        self.cache_size = cache_size
+        self._pending_patterns: List[Tensor] = []
+        """Bit-packed patterns added since the last `flush`, to be deduplicated in it."""
+
+    def add(self, theta: Tensor) -> bool:
+        """Adds the concrete inputs generated from `theta`, and checks each
+        chunk that gets filled.
+
+        Returns:
+            bool: Whether a checked chunk falsified the problem. Always `False` \
+                if `defer_sync=True` or `cache_size > 0`, as the results are then \
+                only read in `flush`.
+        """
+        theta = theta.detach()
+        if self.cache_size > 0:
+            self._pending_patterns.append(pack_sign_patterns(theta))
+            return False
+        return self._add_sign_patterns(theta >= 0)
+
+    def flush(self) -> bool:
+        """Checks the remaining buffered concrete inputs, and returns whether
+        any of the chunks checked since the last `flush` falsified the problem.
+        """
+        if len(self._pending_patterns) > 0:
+            start_time = time.perf_counter()
+            patterns = self._get_unseen_patterns(torch.cat(self._pending_patterns))
+            self._pending_patterns = []
+            self.check_time += time.perf_counter() - start_time
+            for start in range(0, patterns.size(0), self.chunk_size):
+                chunk = unpack_sign_patterns(
+                    patterns[start : start + self.chunk_size], self.L_0.size(0)
+                )
+                if self._add_sign_patterns(chunk):
+                    return True
+
+        is_falsified = self.num_buffered > 0 and self._check_buffer()
+        if self._deferred_is_falsified is not None:
+            is_falsified = is_falsified or bool(self._deferred_is_falsified.item())
+            self._deferred_is_falsified = None
+        return is_falsified
+
+    def pop_check_time(self) -> float:
+        """Returns the time spent checking since the last call, and resets it."""
+        check_time, self.check_time = self.check_time, 0.0
+        return check_time
+
+    def _add_sign_patterns(self, is_non_negative: Tensor) -> bool:
+        """Adds the concrete inputs of the sign patterns `is_non_negative` (ie.
+        `theta >= 0`), and checks each chunk that gets filled.
+        """
+        start = 0
+        while start < is_non_negative.size(0):
+            num_rows = min(self.chunk_size - self.num_buffered, is_non_negative.size(0) - start)
+            end, buffer_end = start + num_rows, self.num_buffered + num_rows
+            torch.where(
+                is_non_negative[start:end],
+                self.L_0,
+                self.U_0,
+                out=self.buffer[self.num_buffered : buffer_end],
+            )
+            self.num_buffered = buffer_end
+            start = end
+            if self.num_buffered == self.chunk_size and self._check_buffer():
+                return True
+        return False
+
+    def _get_unseen_patterns(self, patterns: Tensor) -> Tensor:
+        """Returns the bit-packed `patterns` that weren't seen before (including
+        earlier rows of `patterns`) in their original order, and caches them.
+        """
+        # Bit-packed patterns, in insertion order (for FIFO eviction).
+        seen_patterns = self.solver.adv_check_seen_patterns
+        if seen_patterns is None:
+            seen_patterns = patterns[:0]
+        num_seen = seen_patterns.size(0)
+        all_patterns = torch.cat([seen_patterns, patterns])
+        unique_patterns, inverse = torch.unique(all_patterns, dim=0, return_inverse=True)
+
+        # A pattern is unseen if its 1st occurrence is in `patterns`, as the
+        # seen patterns come first.
+        indices = torch.arange(all_patterns.size(0), device=all_patterns.device)
+        first_indices = torch.full((unique_patterns.size(0),), all_patterns.size(0)).to(indices)
+        first_indices.scatter_reduce_(0, inverse, indices, "amin")
+        is_unseen = (first_indices[inverse] == indices)[num_seen:]
+        unseen_patterns = patterns[is_unseen]
+
+        seen_patterns = torch.cat([seen_patterns, unseen_patterns])
+        self.solver.adv_check_seen_patterns = seen_patterns[-self.cache_size :]
+        return unseen_patterns
+
+    def _check_buffer(self) -> bool:
+        start_time = time.perf_counter()
+        is_falsified = self.adv_check_model.get_is_falsified(self.buffer[: self.num_buffered])
+        self.num_buffered = 0
+
+        output = False
+        if self.defer_sync:
+            self._deferred_is_falsified = (
+                is_falsified
+                if self._deferred_is_falsified is None
+                else self._deferred_is_falsified | is_falsified
+            )
+        else:
+            output = bool(is_falsified.item())
+        self.check_time += time.perf_counter() - start_time
+        return output
+
+
+def pack_sign_patterns(theta: Tensor) -> Tensor:
+    """Bit-packs the sign patterns (ie. `theta >= 0`) of `theta`'s rows.
+
+    Args:
+        theta (Tensor): Shape `(num_rows, num_neurons)`.
+
+    Returns:
+        Tensor: `uint8` tensor of shape `(num_rows, ceil(num_neurons / 8))`.
+    """
+    bits = (theta >= 0).to(torch.uint8)
+    bits = F.pad(bits, (0, -bits.size(1) % 8))
+    place_values = 2 ** torch.arange(7, -1, -1, device=theta.device, dtype=torch.uint8)
+    return (bits.view(bits.size(0), -1, 8) * place_values).sum(dim=2, dtype=torch.uint8)
+
+
+def unpack_sign_patterns(packed_patterns: Tensor, num_neurons: int) -> Tensor:
+    """Unpacks the sign patterns bit-packed by `pack_sign_patterns`.
+
+    Args:
+        packed_patterns (Tensor): `uint8` tensor of shape `(num_rows, ceil(num_neurons / 8))`.
+        num_neurons (int): Num. of neurons of the patterns (ie. excl. the padding bits).
+
+    Returns:
+        Tensor: `bool` tensor of shape `(num_rows, num_neurons)`, of `theta >= 0`.
+    """
+    place_values = 2 ** torch.arange(7, -1, -1, device=packed_patterns.device, dtype=torch.uint8)
+    bits = (packed_patterns.unsqueeze(2) & place_values) != 0
+    return bits.flatten(1)[:, :num_neurons]
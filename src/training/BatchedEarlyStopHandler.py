@@ -0,0 +1,49 @@
+import torch
+from torch import Tensor
+
+
+class BatchedEarlyStopHandler:
+    """Vectorized `EarlyStopHandler`, that determines whether to early-stop
+    each batch independently, based on each batch's own loss.
+    """
+
+    def __init__(
+        self,
+        patience: int,
+        threshold: float,
+        num_batches: int,
+        device: torch.device,
+    ) -> None:
+        """
+        Args:
+            patience (int): Num. of epochs with no improvement, after which a batch should be stopped.
+            threshold (float): Threshold to determine whether there's "no improvement". \
+                No improvement is when `current_loss >= best_loss * (1 - threshold)`.
+            num_batches (int): Number of batches to track.
+            device (torch.device): Device of the losses.
+        """
+        self.patience = patience
+        self.threshold = threshold
+        self._num_no_improvements: Tensor = torch.zeros(
+            (num_batches,), dtype=torch.long, device=device
+        )
+        self._best_loss: Tensor = torch.full((num_batches,), float("inf"), device=device)
+
+    def get_early_stopped_mask(self, current_loss: Tensor) -> Tensor:
+        """Returns a mask of the batches to stop early.
+
+        Args:
+            current_loss (Tensor): Shape `(num_batches,)`. The current loss of each batch.
+        """
+        has_no_improvement = current_loss >= self._best_loss * (1 - self.threshold)
+        self._num_no_improvements = torch.where(
+            has_no_improvement, self._num_no_improvements + 1, 0
+        )
+        self._best_loss = torch.where(has_no_improvement, self._best_loss, current_loss)
+
+        return self._num_no_improvements >= self.patience
+
+    def keep_batches(self, indices: Tensor) -> None:
+        """Keep tracking only the batches `indices`, dropping the rest."""
+        self._num_no_improvements = self._num_no_improvements[indices]
+        self._best_loss = self._best_loss[indices]
@@ -0,0 +1,107 @@
+from typing import Dict, List, Optional, Sequence
+
+from typing_extensions import Literal, TypeAlias
+
+StopReason: TypeAlias = Literal["converged", "falsified"]
+
+
+class TrainingCallback:
+    """Base class for receiving structured events from `solve()` and `train()`.
+
+    Subclass it and override the events of interest. All the events are no-ops
+    by default. Times are wall-clock durations in seconds.
+    """
+
+    time_solver_layers: bool = False
+    """Whether to time each solver layer's forward/backward pass, which are then
+    emitted via `on_solver_layer_times`. Adds a small overhead per epoch, and is
+    skipped when the solver is compiled."""
+
+    def on_layer_start(self, layer_index: int, num_neurons: int) -> None:
+        """Called before solving for layer `layer_index`, which has `num_neurons`
+        neurons to solve for."""
+
+    def on_layer_end(self, layer_index: int, duration: float, is_falsified: bool) -> None:
+        """Called after solving for layer `layer_index` (including all its batches)."""
+
+    def on_compile(self, duration: Optional[float]) -> None:
+        """Called after each training of a compiled solver (see
+        `TrainingConfig.compile_solver`), with the time spent compiling during
+        it (`0` if the compiled graphs were reused), or `duration=None` if the
+        compilation failed."""
+
+    def on_epoch(self, epoch: int, loss: float, lrs: Dict[str, float]) -> None:
+        """Called every epoch after the forward pass, with the epoch's loss and
+        the learning-rates it was trained with, keyed by the param group's name
+        (ie. `"gamma"`, `"pi"` or `"alpha"`)."""
+
+    def on_lr_change(
+        self, epoch: int, old_lrs: Dict[str, float], new_lrs: Dict[str, float]
+    ) -> None:
+        """Called when the LR-scheduler changes the learning-rate of any param
+        group, with the learning-rates of all the groups (see `on_epoch`)."""
+
+    def on_early_stop(self, epoch: int, reason: StopReason) -> None:
+        """Called when training stops, either because it `"converged"` (ie.
+        early-stopped), or because the problem was `"falsified"`."""
+
+    def on_adv_check(self, epoch: int, duration: float, is_falsified: bool) -> None:
+        """Called after each adversarial check."""
+
+    def on_solver_layer_times(
+        self,
+        epoch: int,
+        forward_times: List[float],
+        backward_times: List[float],
+    ) -> None:
+        """Called every epoch with each solver layer's forward/backward time, if
+        `time_solver_layers=True`. Index `i` of the lists corresponds to
+        `solver.sequential[i]`."""
+
+
+class CallbackList(TrainingCallback):
+    """Forwards all the events to each of the callbacks, in order."""
+
+    def __init__(self, callbacks: Sequence[TrainingCallback] = ()) -> None:
+        self.callbacks = list(callbacks)
+        self.time_solver_layers = any(x.time_solver_layers for x in self.callbacks)
+
+    def on_layer_start(self, layer_index: int, num_neurons: int) -> None:
+        for callback in self.callbacks:
+            callback.on_layer_start(layer_index, num_neurons)
+
+    def on_layer_end(self, layer_index: int, duration: float, is_falsified: bool) -> None:
+        for callback in self.callbacks:
+            callback.on_layer_end(layer_index, duration, is_falsified)
+
+    def on_compile(self, duration: Optional[float]) -> None:
+        for callback in self.callbacks:
+            callback.on_compile(duration)
+
+    def on_epoch(self, epoch: int, loss: float, lrs: Dict[str, float]) -> None:
+        for callback in self.callbacks:
+            callback.on_epoch(epoch, loss, lrs)
+
+    def on_lr_change(
+        self, epoch: int, old_lrs: Dict[str, float], new_lrs: Dict[str, float]
+    ) -> None:
+        for callback in self.callbacks:
+            callback.on_lr_change(epoch, old_lrs, new_lrs)
+
+    def on_early_stop(self, epoch: int, reason: StopReason) -> None:
+        for callback in self.callbacks:
+            callback.on_early_stop(epoch, reason)
+
+    def on_adv_check(self, epoch: int, duration: float, is_falsified: bool) -> None:
+        for callback in self.callbacks:
+            callback.on_adv_check(epoch, duration, is_falsified)
+
+    def on_solver_layer_times(
+        self,
+        epoch: int,
+        forward_times: List[float],
+        backward_times: List[float],
+    ) -> None:
+        for callback in self.callbacks:
+            if callback.time_solver_layers:
+                callback.on_solver_layer_times(epoch, forward_times, backward_times)
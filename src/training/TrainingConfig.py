@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Literal, Optional
 
 from dataclass_wizard import YAMLWizard
 from typing_extensions import override
@@ -9,8 +10,31 @@ class TrainingConfig(YAMLWizard):
     # ==========================================================================
     #                      Optimizer & LR-scheduler configs
     # ==========================================================================
+    optimizer: str = "adam"
+    """Optimizer to train with, out of `optimizers.OPTIMIZERS`:
+    - "adam": `Adam`.
+    - "sgd": Momentum `SGD` (see `sgd_momentum`). Keeps 1 state tensor per parameter instead
+      of Adam's 2, so it uses less memory for large batches, but may converge slower.
+    - "projected_adam"/"projected_sgd": Same as above, but the parameters are projected onto
+      their domains (ie. clamped) as part of each optimizer step, instead of separately.
+    Defaults to "adam"."""
+    scheduler: str = "reduce_lr_on_plateau"
+    """LR-scheduler to train with, out of `optimizers.SCHEDULERS`:
+    - "reduce_lr_on_plateau": `ReduceLROnPlateau`, configured by the `reduce_lr_*` & `min_lr`
+      configs below.
+    - "constant": Keeps the starting LRs.
+    Defaults to "reduce_lr_on_plateau"."""
     max_lr: float = 1
-    """Max learning-rate. The starting LR given to the `Adam` optimizer. Defaults to 1."""
+    """Max learning-rate. The starting LR given to the optimizer, for the parameters without
+    their own LR below. Defaults to 1."""
+    gamma_lr: Optional[float] = None
+    """Starting LR of `gamma`. Defaults to None (ie. `max_lr`)."""
+    pi_lr: Optional[float] = None
+    """Starting LR of `pi`. Defaults to None (ie. `max_lr`)."""
+    alpha_lr: Optional[float] = None
+    """Starting LR of `alpha`. Defaults to None (ie. `max_lr`)."""
+    sgd_momentum: float = 0.9
+    """Momentum factor of the "sgd"/"projected_sgd" optimizers. Defaults to 0.9."""
     min_lr: float = 1e-6
     """Min learning-rate to decay until.
     The `min_lr` param used by the `ReduceLROnPlateau` scheduler. Defaults to 1e-6."""
@@ -34,6 +58,53 @@ class TrainingConfig(YAMLWizard):
     """Threshold to determine whether there's "no improvement" for early-stopping.
     No improvement is when `current_loss >= best_loss * (1 - threshold)`.
     Defaults to 1e-3."""
+    stop_per_batch: bool = False
+    """Whether to early-stop each batch (ie. each neuron's min/max objective) independently,
+    using `stop_patience` and `stop_threshold` on each batch's own loss. Stopped batches are
+    frozen and dropped from subsequent epochs, and training stops once all batches have
+    stopped. Defaults to False (ie. early-stop on the summed loss of all batches)."""
+
+    # ==========================================================================
+    #                              Solving configs
+    # ==========================================================================
+    propagate_bounds: bool = False
+    """Whether to write each layer's tightened bounds back into the solver before solving
+    the next layer. The stable/unstable masks and relaxations are then recomputed, so
+    neurons that became stable are no longer solved for. Defaults to False."""
+    num_workers: int = 1
+    """Num. of CPU worker processes to solve the layers in parallel with. As the layers are then
+    solved independently, it can't be used with `propagate_bounds`. Defaults to 1 (ie. solve
+    the layers sequentially in the current process)."""
+    compile_solver: bool = False
+    """Whether to compile the solver's forward & backward passes via `torch.compile`. The
+    solver is only compiled once (with a dynamic batch dim), and the compiled graphs are
+    reused across the batches and layers. The compilation time is logged separately from
+    the training time. Falls back to eager mode if compiling either pass fails. Defaults to
+    False."""
+    keep_dual_parameters: bool = False
+    """Whether to keep each solved layer's dual parameters (on CPU) in `Solver.dual_parameters`,
+    such that they can warm-start the solve of a related problem via `solve()`'s
+    `initial_dual_parameters`. Defaults to False."""
+    dtype: Literal["bfloat16", "float32", "float64"] = "float32"
+    """Dtype to solve in. The learnable parameters, transposed layers and `P`/`P_hat` are in
+    this dtype, while the bounds and the objective are accumulated in at least float32. Use
+    "bfloat16" to halve the memory bandwidth of the large matrix-multiplications on CPU, or
+    "float64" when debugging borderline bounds. The returned bounds are always float32 (rounded
+    outwards). Defaults to "float32"."""
+    finalize_in_float64: bool = False
+    """Whether to evaluate the objective once more in float64 at each batch's final dual
+    parameters (from the original, unrounded inputs), and compute the bounds from it. The
+    bounds then don't inherit the rounding errors of solving in `dtype`, and are rounded outwards
+    to float32. Costs 1 extra forward pass per batch (and building float64 solver layers once per
+    layer). Has no effect if `dtype="float64"`. Defaults to False."""
+
+    # ==========================================================================
+    #                              Batching configs
+    # ==========================================================================
+    max_batch_size: Optional[int] = None
+    """Max. number of batches (ie. rows, 2 per neuron) to solve for at once. Layers with
+    more neurons to solve for are solved in consecutive batches of at most this size,
+    bounding the peak memory usage. Must be >= 2. Defaults to None (ie. no limit)."""
 
     # ==========================================================================
     #                                Misc. configs
@@ -43,6 +114,22 @@ class TrainingConfig(YAMLWizard):
     num_epoch_adv_check: int = 10
     """Perform adversarial check every `num_epoch_adv_check` epochs. Only has an effect when
     `disable_adv_check=False`. Defaults to 10."""
+    adv_check_chunk_size: int = 1024
+    """Num. of concrete inputs to run through the adversarial-check model at once. The
+    concrete inputs are generated from each epoch's theta into a fixed-size buffer, which is
+    checked whenever it's full, and flushed every `num_epoch_adv_check` epochs. Defaults to 1024."""
+    adv_check_cache_size: int = 0
+    """Max. num. of already-checked sign patterns of theta (which determine the concrete
+    inputs) to cache on-device per layer solve (ie. across all its batches), such that
+    repeated concrete inputs aren't checked again. The patterns are then only deduplicated and checked every
+    `num_epoch_adv_check` epochs, instead of as each chunk fills up. Defaults to 0 (ie. no
+    caching)."""
+    sync_interval: int = 1
+    """Num. of epochs between each host-device sync. The losses are kept on-device, and the
+    early-stopping, LR-scheduling, progress-bar updates and adversarial checks are only done
+    every `sync_interval` epochs, by replaying the buffered losses in order. The stopping/LR
+    decisions are thus the same as with `sync_interval=1`, but take effect up to
+    `sync_interval - 1` epochs late. Defaults to 1 (ie. sync every epoch)."""
     disable_progress_bar: bool = False
     """Whether to disable tqdm's progress bar during training. Defaults to False."""
 
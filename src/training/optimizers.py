@@ -0,0 +1,150 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+from torch import nn
+from torch.optim import SGD, Adam, Optimizer
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+
+from .TrainingConfig import TrainingConfig
+
+PARAMETER_DOMAINS: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    "gamma": (0, None),
+    "pi": (0, None),
+    "alpha": (0, 1),
+}
+"""`(min, max)` of each learnable parameter's values (see `clamp_parameters`).
+Also the names of the parameter groups, in order."""
+
+ParamGroups = List[Dict[str, Any]]
+
+
+class ProjectedOptimizer(Optimizer):
+    """Mixin for an `Optimizer`, that projects the parameters onto their
+    domains (ie. clamps them to their param group's `min`/`max`) as part of
+    each step, instead of via a separate `clamp_parameters` call.
+
+    Must come before the optimizer in the bases, eg. `class X(ProjectedOptimizer, Adam)`.
+    """
+
+    def step(self, closure: Optional[Callable[[], float]] = None) -> Optional[float]:
+        loss = super().step(closure)  # type: ignore
+        with torch.no_grad():
+            for group in self.param_groups:
+                for param in group["params"]:
+                    param.clamp_(min=group["min"], max=group["max"])
+        return loss
+
+
+class ProjectedAdam(ProjectedOptimizer, Adam):
+    """`Adam` that projects the parameters onto their domains in each step."""
+
+
+class ProjectedSGD(ProjectedOptimizer, SGD):
+    """`SGD` that projects the parameters onto their domains in each step."""
+
+
+def _create_adam(param_groups: ParamGroups, config: TrainingConfig) -> Optimizer:
+    return Adam(param_groups, config.max_lr)
+
+
+def _create_sgd(param_groups: ParamGroups, config: TrainingConfig) -> Optimizer:
+    return SGD(param_groups, config.max_lr, momentum=config.sgd_momentum)
+
+
+def _create_projected_adam(param_groups: ParamGroups, config: TrainingConfig) -> Optimizer:
+    return ProjectedAdam(param_groups, config.max_lr)
+
+
+def _create_projected_sgd(param_groups: ParamGroups, config: TrainingConfig) -> Optimizer:
+    return ProjectedSGD(param_groups, config.max_lr, momentum=config.sgd_momentum)
+
+
+OPTIMIZERS: Dict[str, Callable[[ParamGroups, TrainingConfig], Optimizer]] = {
+    "adam": _create_adam,
+    "sgd": _create_sgd,
+    "projected_adam": _create_projected_adam,
+    "projected_sgd": _create_projected_sgd,
+}
+"""Optimizers selectable via `TrainingConfig.optimizer`, each created from the
+param groups (see `get_param_groups`) and the config. Register new ones here."""
+
+SchedulerStep = Callable[[float], None]
+"""Steps an LR-scheduler with an epoch's loss."""
+
+
+def _create_reduce_lr_on_plateau(optimizer: Optimizer, config: TrainingConfig) -> SchedulerStep:
+    scheduler = ReduceLROnPlateau(
+        optimizer,
+        factor=config.reduce_lr_factor,
+        patience=config.reduce_lr_patience,
+        threshold=config.reduce_lr_threshold,
+        min_lr=config.min_lr,
+    )
+    return lambda loss: scheduler.step(loss)
+
+
+def _create_constant_lr(optimizer: Optimizer, config: TrainingConfig) -> SchedulerStep:
+    return lambda loss: None
+
+
+SCHEDULERS: Dict[str, Callable[[Optimizer, TrainingConfig], SchedulerStep]] = {
+    "reduce_lr_on_plateau": _create_reduce_lr_on_plateau,
+    "constant": _create_constant_lr,
+}
+"""LR-schedulers selectable via `TrainingConfig.scheduler`, each created from the
+optimizer and the config. Register new ones here."""
+
+
+def get_param_groups(module: nn.Module, config: TrainingConfig) -> ParamGroups:
+    """Returns the param groups of `module`'s learnable parameters, with 1 group
+    per parameter name in `PARAMETER_DOMAINS` (skipping those without any
+    parameters), each with its own LR (defaulting to `config.max_lr`) and domain.
+    """
+    group_lrs = {"gamma": config.gamma_lr, "pi": config.pi_lr, "alpha": config.alpha_lr}
+    params: Dict[str, List[nn.Parameter]] = {name: [] for name in PARAMETER_DOMAINS}
+    for full_name, param in module.named_parameters():
+        name = full_name.rsplit(".", 1)[-1]
+        if not param.requires_grad:  # Skip the frozen weights of the model/transposed layers.
+            continue
+        assert name in params, f"Expected a learnable parameter in {list(params)}, got `{name}`."
+        params[name].append(param)
+
+    param_groups: ParamGroups = []
+    for name, (min_value, max_value) in PARAMETER_DOMAINS.items():
+        if len(params[name]) == 0:
+            continue
+        lr = group_lrs[name]
+        param_groups.append(
+            {
+                "name": name,
+                "params": params[name],
+                "lr": lr if lr is not None else config.max_lr,
+                "min": min_value,
+                "max": max_value,
+            }
+        )
+    return param_groups
+
+
+def get_lrs(optimizer: Optimizer) -> Dict[str, float]:
+    """Returns the current LR of each of `optimizer`'s param groups, keyed by the
+    group's name (see `get_param_groups`)."""
+    return {group["name"]: group["lr"] for group in optimizer.param_groups}
+
+
+def create_optimizer(module: nn.Module, config: TrainingConfig) -> Optimizer:
+    """Creates the `config.optimizer` optimizer (see `OPTIMIZERS`) for `module`'s
+    learnable parameters, with their param groups from `get_param_groups`.
+    """
+    assert (
+        config.optimizer in OPTIMIZERS
+    ), f"Expected `optimizer` to be one of {list(OPTIMIZERS)}, but got `{config.optimizer}`."
+    return OPTIMIZERS[config.optimizer](get_param_groups(module, config), config)
+
+
+def create_scheduler(optimizer: Optimizer, config: TrainingConfig) -> SchedulerStep:
+    """Creates the `config.scheduler` LR-scheduler (see `SCHEDULERS`) for `optimizer`."""
+    assert (
+        config.scheduler in SCHEDULERS
+    ), f"Expected `scheduler` to be one of {list(SCHEDULERS)}, but got `{config.scheduler}`."
+    return SCHEDULERS[config.scheduler](optimizer, config)
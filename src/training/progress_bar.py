@@ -0,0 +1,20 @@
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    from tqdm import tqdm
+
+
+def create_progress_bar(initial: int, disable: bool = False) -> "tqdm":
+    """Creates the progress bar of the training epochs.
+
+    `tqdm` is only imported here on first use, as importing `tqdm.autonotebook`
+    (which checks for an IPython/Jupyter environment) is slow.
+    """
+    from tqdm.autonotebook import tqdm
+
+    return tqdm(desc="Training", total=None, unit=" epoch", initial=initial, disable=disable)
+
+
+def get_lr_postfix(lrs: Dict[str, float]) -> Dict[str, float]:
+    """Returns the progress bar's postfix of the LR of each param group."""
+    return {f"LR ({name})": lr for name, lr in lrs.items()}
@@ -1,17 +1,29 @@
-from typing import List
+import logging
+import time
+from typing import List, Optional
 
 import torch
 from torch import Tensor
-from torch.optim import Adam
-from torch.optim.lr_scheduler import ReduceLROnPlateau
-from tqdm.autonotebook import tqdm
+from torch.optim import Optimizer
 
+from ..modules.LayerTimer import LayerTimer
 from ..modules.Solver import Solver
+from .AdversarialChecker import AdversarialChecker
+from .BatchedEarlyStopHandler import BatchedEarlyStopHandler
 from .EarlyStopHandler import EarlyStopHandler
+from .optimizers import ProjectedOptimizer, create_optimizer, create_scheduler, get_lrs
+from .progress_bar import create_progress_bar, get_lr_postfix
+from .TrainingCallback import TrainingCallback
 from .TrainingConfig import TrainingConfig
 
+logger = logging.getLogger(__name__)
 
-def train(solver: Solver, config: TrainingConfig = TrainingConfig()) -> bool:
+
+def train(
+    solver: Solver,
+    config: TrainingConfig = TrainingConfig(),
+    callback: TrainingCallback = TrainingCallback(),
+) -> bool:
     """Train `solver` until convergence or until the problem is falsified, and
     return whether the problem was falsified.
 
@@ -22,83 +34,221 @@ def train(solver: Solver, config: TrainingConfig = TrainingConfig()) -> bool:
         solver (Solver): The `Solver` model to train.
         config (TrainingConfig, optional): Configuration to use during training. \
             Defaults to TrainingConfig().
+        callback (TrainingCallback, optional): Callback to emit the training events to. \
+            Use `CallbackList` for multiple callbacks. Defaults to TrainingCallback() (ie. no-op).
 
     Returns:
         bool: Whether the problem was falsified. `False` if `solver` was trained to \
             convergence, `True` if training was stopped prematurely due to being falsified.
     """
-    optimizer = Adam(solver.parameters(), config.max_lr)
-    scheduler = ReduceLROnPlateau(
-        optimizer,
-        factor=config.reduce_lr_factor,
-        patience=config.reduce_lr_patience,
-        threshold=config.reduce_lr_threshold,
-        min_lr=config.min_lr,
-    )
+    # Compiled lazily on the first forward pass, and only once per solver.
+    solver.set_compiled(config.compile_solver)
+
+    # Layer timings are skipped when compiled, as the layers are then fused.
+    if callback.time_solver_layers and not solver.is_compiled:
+        solver.sequential.layer_timer = LayerTimer(len(solver.sequential))
+
+    start_time = time.perf_counter()
+    try:
+        return _train(solver, config, callback)
+    finally:
+        solver.restore_all_batches()
+        solver.sequential.layer_timer = None
+
+        solve_time = time.perf_counter() - start_time
+        compile_time = solver.compile_timer.pop_compile_time()
+        if config.compile_solver:
+            callback.on_compile(compile_time if solver.is_compiled else None)
+        if compile_time == 0.0:
+            logger.info(f"Training took {solve_time:.3f}s.")
+        else:
+            logger.info(
+                f"Training took {solve_time - compile_time:.3f}s, "
+                f"excluding {compile_time:.3f}s of compilation."
+            )
+
+
+def _train(solver: Solver, config: TrainingConfig, callback: TrainingCallback) -> bool:
+    """Training loop of `train`, without the setup/teardown."""
+    assert config.sync_interval >= 1, "Expected `sync_interval` to be >= 1."
+    optimizer = create_optimizer(solver, config)
+    scheduler_step = create_scheduler(optimizer, config)
+    # Projected optimizers already clamp the parameters in each step.
+    is_projected = isinstance(optimizer, ProjectedOptimizer)
     early_stop_handler = EarlyStopHandler(config.stop_patience, config.stop_threshold)
+    batched_early_stop_handler = (
+        BatchedEarlyStopHandler(
+            config.stop_patience,
+            config.stop_threshold,
+            num_batches=solver.sequential[0].num_batches,
+            device=solver.sequential[0].L.device,
+        )
+        if config.stop_per_batch
+        else None
+    )
+
+    adv_checker = (
+        AdversarialChecker(
+            solver,
+            config.adv_check_chunk_size,
+            defer_sync=config.sync_interval > 1,
+            cache_size=config.adv_check_cache_size,
+        )
+        if not config.disable_adv_check
+        else None
+    )
+    num_epochs_since_adv_check = 0
 
-    theta_list: List[Tensor] = []
+    # The losses & stopped-batches mask since the last sync, kept on-device.
+    loss_history: List[Tensor] = []
+    batches_to_stop: Optional[Tensor] = None
 
     epoch = 1
-    pbar = tqdm(
-        desc="Training",
-        total=None,
-        unit=" epoch",
-        initial=epoch,
-        disable=config.disable_progress_bar,
-    )
+    pbar = create_progress_bar(epoch, disable=config.disable_progress_bar)
     while True:
         max_objective, theta = solver.forward()
-        if not config.disable_adv_check:
-            # Accumulate thetas for later concrete-input adversarial checking.
-            theta_list.append(theta)
+        if adv_checker is not None:
+            # Check the concrete inputs generated from theta, in chunks.
+            num_epochs_since_adv_check += 1
+            if adv_checker.add(theta):
+                callback.on_adv_check(epoch, adv_checker.pop_check_time(), True)
+                callback.on_early_stop(epoch, "falsified")
+                return True
 
         loss = -max_objective.sum()
-        loss_float = loss.item()
 
-        if early_stop_handler.is_early_stopped(loss_float):
-            pbar.set_description(f"Training stopped at epoch {epoch}, Loss: {loss_float}")
-            pbar.close()
-            break
+        if batched_early_stop_handler is None:
+            loss_history.append(loss.detach())
+        else:
+            # Include the frozen batches' losses, so that it doesn't jump as batches are frozen.
+            loss_history.append(-solver.last_max_objective.sum())
+            # Batches are stopped on the 1st epoch they're early-stopped on.
+            new_batches_to_stop = batched_early_stop_handler.get_early_stopped_mask(
+                -max_objective.detach()
+            )
+            batches_to_stop = (
+                new_batches_to_stop
+                if batches_to_stop is None
+                else batches_to_stop | new_batches_to_stop
+            )
+
+        # Only sync with the device every `sync_interval` epochs, replaying the
+        # early-stopping and LR-scheduling on the losses since the last sync.
+        is_sync_epoch = epoch % config.sync_interval == 0
+        losses: List[float] = []
+        if is_sync_epoch:
+            losses = torch.stack(loss_history).tolist()
+            loss_history = []
+            current_lrs = get_lrs(optimizer)
+            first_epoch = epoch - len(losses) + 1
+
+            is_early_stopped = False
+            for i, loss_float in enumerate(losses):
+                callback.on_epoch(first_epoch + i, loss_float, current_lrs)
+                if batched_early_stop_handler is None:
+                    is_early_stopped = early_stop_handler.is_early_stopped(loss_float)
+                    if is_early_stopped:
+                        break
+            if batches_to_stop is not None:
+                is_early_stopped = bool(batches_to_stop.all().item())
+
+            if is_early_stopped:
+                pbar.update(len(losses) - 1)
+                pbar.set_description(f"Training stopped at epoch {epoch}, Loss: {losses[-1]}")
+                pbar.close()
+                break
 
         # Backward pass and optimization.
         optimizer.zero_grad()
-        loss.backward()
+        backward(solver, loss)
+        layer_timer = solver.sequential.layer_timer
+        if layer_timer is not None:
+            backward_times = layer_timer.get_backward_times(time.perf_counter())
+            callback.on_solver_layer_times(epoch, layer_timer.forward_times, backward_times)
+
+        # Freeze the converged batches (and drop them from subsequent epochs)
+        # before the step, such that their parameters are kept as they were
+        # when their last objective values (in `last_max_objective`) were computed.
+        if is_sync_epoch:
+            if batches_to_stop is not None and bool(batches_to_stop.any().item()):
+                assert batched_early_stop_handler is not None
+                keep_indices = torch.where(~batches_to_stop)[0]
+                keep_optimizer_state_batches(optimizer, keep_indices)
+                solver.keep_batches(keep_indices)
+                batched_early_stop_handler.keep_batches(keep_indices)
+            batches_to_stop = None
+
         optimizer.step()
-        scheduler.step(loss_float)
 
         # Clamp learnable parameters to their respective value ranges.
-        solver.clamp_parameters()
-
-        if not config.disable_adv_check and epoch % config.num_epoch_adv_check == 0:
-            # Check if accumulated thetas fails adversarial check.
-            # If it fails, stop prematurely. If it passes, purge the
-            # accumulated thetas to free up memory.
-            if is_falsified_by_concrete_inputs(solver, theta_list):
+        if not is_projected:
+            solver.clamp_parameters()
+
+        if not is_sync_epoch:
+            epoch += 1
+            continue
+
+        for loss_float in losses:
+            old_lrs = get_lrs(optimizer)
+            scheduler_step(loss_float)
+            new_lrs = get_lrs(optimizer)
+            if new_lrs != old_lrs:
+                callback.on_lr_change(epoch, old_lrs, new_lrs)
+
+        if adv_checker is not None and num_epochs_since_adv_check >= config.num_epoch_adv_check:
+            # Check the remaining buffered concrete inputs, and stop prematurely
+            # if they (or any deferred chunk results) falsify the problem.
+            if run_adv_check(adv_checker, epoch, callback):
+                callback.on_early_stop(epoch, "falsified")
                 return True
-            theta_list = []
+            num_epochs_since_adv_check = 0
 
-        current_lr = optimizer.param_groups[0]["lr"]
-        pbar.set_postfix({"Loss": loss_float, "LR": current_lr})
-        pbar.update()
+        pbar.set_postfix({"Loss": losses[-1], **get_lr_postfix(get_lrs(optimizer))})
+        pbar.update(len(losses))
         epoch += 1
 
-    if (
-        not config.disable_adv_check
-        and len(theta_list) > 0
-        and is_falsified_by_concrete_inputs(solver, theta_list)
-    ):
+    if adv_checker is not None and run_adv_check(adv_checker, epoch, callback):
+        callback.on_early_stop(epoch, "falsified")
         return True
 
+    callback.on_early_stop(epoch, "converged")
     return False
 
 
-def is_falsified_by_concrete_inputs(solver: Solver, theta_list: List[Tensor]) -> bool:
-    """Whether concrete inputs generated from `theta_list` falsifies the problem
-    via the adversarial-check model (ie. training should be stopped).
+def backward(solver: Solver, loss: Tensor) -> None:
+    """Backward pass of `loss = -solver.forward()[0].sum()`.
+
+    If the solver is compiled, its backward graph is only compiled on its first
+    backward pass. If that fails, the solver falls back to eager mode, and the
+    forward & backward passes are re-run eagerly (at the same parameters, so
+    the loss is the same).
+    """
+    if not solver.is_compiled:
+        loss.backward()
+        return
+    try:
+        loss.backward()
+    except Exception as e:
+        solver.fall_back_to_eager(e)
+        solver.zero_grad()  # Drop any gradients accumulated before the failure.
+        max_objective, _ = solver.forward()
+        (-max_objective.sum()).backward()
+
+
+def keep_optimizer_state_batches(optimizer: Optimizer, indices: Tensor) -> None:
+    """Keep only the batches `indices` of the optimizer's per-parameter states
+    (eg. `Adam`'s moment estimates), to match the parameters' batches kept via
+    `Solver.keep_batches`.
     """
-    thetas = torch.cat(theta_list, dim=0)
-    L_0: Tensor = solver.sequential[0].L.detach()
-    U_0: Tensor = solver.sequential[0].U.detach()
-    concrete_inputs: Tensor = torch.where(thetas >= 0, L_0, U_0)
-    return solver.adv_check_model.forward(concrete_inputs)
+    for state in optimizer.state.values():
+        for key, value in list(state.items()):
+            # Skip scalar states (eg. `Adam`'s step count).
+            if isinstance(value, Tensor) and value.dim() > 0:
+                state[key] = value[indices]
+
+
+def run_adv_check(adv_checker: AdversarialChecker, epoch: int, callback: TrainingCallback) -> bool:
+    """Flushes `adv_checker`, and emits the time spent checking to `callback`."""
+    is_falsified = adv_checker.flush()
+    callback.on_adv_check(epoch, adv_checker.pop_check_time(), is_falsified)
+    return is_falsified
@@ -0,0 +1,171 @@
+from typing import Dict, List, Set
+
+import torch
+from torch import Tensor
+
+from ..modules.MultiInstanceSolver import MultiInstanceSolver
+from .AdversarialChecker import AdversarialChecker
+from .EarlyStopHandler import EarlyStopHandler
+from .optimizers import ProjectedOptimizer, create_optimizer, create_scheduler, get_lrs
+from .progress_bar import create_progress_bar, get_lr_postfix
+from .TrainingCallback import TrainingCallback
+from .TrainingConfig import TrainingConfig
+
+
+def train_multi_instance(
+    solver: MultiInstanceSolver,
+    config: TrainingConfig = TrainingConfig(),
+    callback: TrainingCallback = TrainingCallback(),
+) -> Set[int]:
+    """Train `solver`'s active instances until convergence (of their summed
+    loss), or until all of them are falsified, and return the falsified ones.
+
+    Like `train`, the losses are only read from the device every
+    `config.sync_interval` epochs, and the instances are only checked for being
+    falsified every `config.num_epoch_adv_check` epochs (on a sync epoch), after
+    which the falsified instances are dropped from the subsequent epochs.
+
+    Args:
+        solver (MultiInstanceSolver): The `MultiInstanceSolver` model to train.
+        config (TrainingConfig, optional): Configuration to use during training. \
+            `compile_solver` and `stop_per_batch` aren't supported. \
+            Defaults to TrainingConfig().
+        callback (TrainingCallback, optional): Callback to emit the training events to. \
+            Defaults to TrainingCallback() (ie. no-op).
+
+    Returns:
+        Set[int]: Indices of the instances that were falsified.
+    """
+    assert config.sync_interval >= 1, "Expected `sync_interval` to be >= 1."
+    assert (
+        not config.compile_solver
+    ), "Compiling the solver isn't supported with multiple instances."
+    assert (
+        not config.stop_per_batch
+    ), "Per-batch early-stopping isn't supported with multiple instances."
+    optimizer = create_optimizer(solver, config)
+    scheduler_step = create_scheduler(optimizer, config)
+    # Projected optimizers already clamp the parameters in each step.
+    is_projected = isinstance(optimizer, ProjectedOptimizer)
+    early_stop_handler = EarlyStopHandler(config.stop_patience, config.stop_threshold)
+
+    # The results of the checked chunks are only read when flushed (ie. on the sync epochs).
+    adv_checkers: Dict[int, AdversarialChecker] = (
+        {
+            i: AdversarialChecker(
+                solver.get_solver(i),
+                config.adv_check_chunk_size,
+                defer_sync=True,
+                cache_size=config.adv_check_cache_size,
+            )
+            for i in solver.active_instances
+        }
+        if not config.disable_adv_check
+        else {}
+    )
+    num_epochs_since_adv_check = 0
+    falsified_instances: Set[int] = set()
+
+    # The losses since the last sync, kept on-device.
+    loss_history: List[Tensor] = []
+
+    epoch = 1
+    pbar = create_progress_bar(epoch, disable=config.disable_progress_bar)
+    while True:
+        outputs = solver.forward()
+        for instance_index, (_, theta) in zip(solver.active_instances, outputs):
+            if instance_index in adv_checkers:
+                adv_checkers[instance_index].add(theta)
+        num_epochs_since_adv_check += 1
+
+        loss = -torch.stack([max_objective.sum() for max_objective, _ in outputs]).sum()
+        loss_history.append(loss.detach())
+
+        # Only sync with the device every `sync_interval` epochs, replaying the
+        # early-stopping and LR-scheduling on the losses since the last sync.
+        is_sync_epoch = epoch % config.sync_interval == 0
+        losses: List[float] = []
+        if is_sync_epoch:
+            losses = torch.stack(loss_history).tolist()
+            loss_history = []
+            current_lrs = get_lrs(optimizer)
+            first_epoch = epoch - len(losses) + 1
+
+            is_early_stopped = False
+            for i, loss_float in enumerate(losses):
+                callback.on_epoch(first_epoch + i, loss_float, current_lrs)
+                is_early_stopped = early_stop_handler.is_early_stopped(loss_float)
+                if is_early_stopped:
+                    break
+
+            if is_early_stopped:
+                pbar.update(len(losses) - 1)
+                pbar.set_description(f"Training stopped at epoch {epoch}, Loss: {losses[-1]}")
+                pbar.close()
+                break
+
+        # Backward pass and optimization. The dropped instances' parameters
+        # have no gradients, so the optimizer leaves them as they are.
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+        # Clamp learnable parameters to their respective value ranges.
+        if not is_projected:
+            solver.clamp_parameters()
+
+        if not is_sync_epoch:
+            epoch += 1
+            continue
+
+        for loss_float in losses:
+            old_lrs = get_lrs(optimizer)
+            scheduler_step(loss_float)
+            new_lrs = get_lrs(optimizer)
+            if new_lrs != old_lrs:
+                callback.on_lr_change(epoch, old_lrs, new_lrs)
+
+        if len(adv_checkers) > 0 and num_epochs_since_adv_check >= config.num_epoch_adv_check:
+            # Check the remaining buffered concrete inputs of each instance,
+            # and drop the falsified instances.
+            newly_falsified = run_adv_checks(adv_checkers, epoch, callback)
+            falsified_instances |= newly_falsified
+            solver.drop_instances(newly_falsified)
+            if len(solver.active_instances) == 0:
+                pbar.close()
+                callback.on_early_stop(epoch, "falsified")
+                return falsified_instances
+            num_epochs_since_adv_check = 0
+
+        pbar.set_postfix({"Loss": losses[-1], **get_lr_postfix(get_lrs(optimizer))})
+        pbar.update(len(losses))
+        epoch += 1
+
+    if len(adv_checkers) > 0:
+        newly_falsified = run_adv_checks(adv_checkers, epoch, callback)
+        falsified_instances |= newly_falsified
+        solver.drop_instances(newly_falsified)
+        if len(solver.active_instances) == 0:
+            callback.on_early_stop(epoch, "falsified")
+            return falsified_instances
+
+    callback.on_early_stop(epoch, "converged")
+    return falsified_instances
+
+
+def run_adv_checks(
+    adv_checkers: Dict[int, AdversarialChecker], epoch: int, callback: TrainingCallback
+) -> Set[int]:
+    """Flushes each instance's `adv_checker` (removing those that falsified their
+    instance from `adv_checkers`), and emits the total time spent checking to
+    `callback`.
+
+    Returns:
+        Set[int]: Indices of the instances that were falsified.
+    """
+    falsified_instances = {i for i, x in adv_checkers.items() if x.flush()}
+    check_time = sum(x.pop_check_time() for x in adv_checkers.values())
+    callback.on_adv_check(epoch, check_time, len(falsified_instances) > 0)
+    for i in falsified_instances:
+        del adv_checkers[i]
+    return falsified_instances
@@ -1,13 +1,16 @@
+import hashlib
 import os
 import random
-from typing import Callable, List, Literal, Tuple, Union, overload
+from typing import TYPE_CHECKING, Callable, List, Literal, Tuple, Union, overload
 
 import numpy as np
-import onnx
-import onnx2torch
 import torch
+from torch import Tensor
 from torch.fx.graph_module import GraphModule
 
+if TYPE_CHECKING:
+    import onnx
+
 
 def set_abs_path_to(current_dir: str) -> Callable[[str], str]:
     """Higher-order-function for getting absolute paths relative to `current_dir`.
@@ -33,6 +36,18 @@ def seed_everything(seed: int) -> None:
     torch.cuda.manual_seed_all(seed)
 
 
+def update_hasher(hasher: "hashlib._Hash", tensor: Tensor) -> None:
+    """Updates `hasher` with `tensor`'s dtype, shape and values, such that
+    tensors only hash the same if they're identical.
+    """
+    tensor = tensor.detach().cpu().contiguous()
+    hasher.update(f"{tensor.dtype}:{tuple(tensor.shape)};".encode())
+    # Unsupported by numpy, but exactly representable in float32 (after the dtype is hashed).
+    if tensor.dtype == torch.bfloat16:
+        tensor = tensor.float()
+    hasher.update(tensor.numpy().tobytes())
+
+
 # fmt: off
 @overload
 def load_onnx_model(onnx_file_path: str, return_input_shape: Literal[False] = False) -> GraphModule: ...
@@ -54,6 +69,10 @@ def load_onnx_model(onnx_file_path: str, return_input_shape: bool = False) -> Un
             ONNX model converted to a PyTorch module, and optionally, the ONNX \
             model's input shape when `return_input_shape=True`.
     """
+    # Imported here, as they're slow to import and only needed to load ONNX models.
+    import onnx
+    import onnx2torch
+
     onnx_model = onnx.load(onnx_file_path)
     return (
         (onnx2torch.convert(onnx_model), get_onnx_input_shape(onnx_model))
@@ -62,7 +81,7 @@ def load_onnx_model(onnx_file_path: str, return_input_shape: bool = False) -> Un
     )
 
 
-def get_onnx_input_shape(onnx_model: onnx.ModelProto) -> Tuple[int, ...]:
+def get_onnx_input_shape(onnx_model: "onnx.ModelProto") -> Tuple[int, ...]:
     """Gets the ONNX model's input shape.
 
     Note: Assumes that there's exactly 1 input.